@@ -1,4 +1,6 @@
 from posts.models import Post
+from posts.counters import like_counter
+from blog.pagination import KeysetPaginationMixin
 from django.views.generic import ListView
 from django.contrib.auth.forms import UserCreationForm
 from django.views.generic import CreateView
@@ -16,13 +18,14 @@ class SignUpView(CreateView):
     template_name = 'posts/register.html'
 
 
-class MyPostsListView(LoginRequiredMixin, ListView):
+class MyPostsListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'posts/my_posts.html'
     context_object_name = 'posts'
     paginate_by = 10
 
     def get_queryset(self):
-        return Post.objects.filter(
+        posts = Post.objects.filter(
             author=self.request.user
-        ).order_by('-created_at')
\ No newline at end of file
+        ).with_viewer_state(self.request.user)
+        return like_counter.annotate(posts).order_by('-created_at')
\ No newline at end of file
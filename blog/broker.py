@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Сообщений в очереди одного подписчика; при переполнении теряются старые
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """
+    Очередь сообщений одного клиента по набору тем. Читается в цикле
+    событий клиента, а доставка возможна из любого потока.
+    """
+
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = frozenset(topics)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    def deliver(self, topic, data):
+        self._loop.call_soon_threadsafe(self._put, topic, data)
+
+    def _put(self, topic, data):
+        if self._queue.full():
+            # Медленный клиент: старое сообщение важнее потерять, чем новое
+            self._queue.get_nowait()
+        self._queue.put_nowait((topic, data))
+
+    async def get(self):
+        """Следующее сообщение (тема, данные)."""
+        return await self._queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Публикация и подписка внутри одного процесса. Подходит для одного
+    ASGI-воркера; при нескольких нужен общий брокер, например PostgresBroker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, topics):
+        """Подписка на темы; вызывается из цикла событий подписчика."""
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscriptions.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[topic]
+
+    def publish(self, topic, data):
+        self.publish_many([(topic, data)])
+
+    def publish_many(self, messages):
+        """Публикует [(тема, данные)]; данные должны сериализоваться в JSON."""
+        for topic, data in messages:
+            self.deliver(topic, data)
+
+    def deliver(self, topic, data):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        for subscription in subscribers:
+            subscription.deliver(topic, data)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Общий брокер для нескольких процессов через LISTEN/NOTIFY PostgreSQL.
+    Сообщения уходят NOTIFY через соединение Django текущего потока (в
+    транзакции — после ее фиксации). Фоновый поток процесса слушает канал
+    отдельным соединением и раздает сообщения локальным подписчикам.
+    """
+
+    channel = "blog_events"
+    # NOTIFY ограничивает размер сообщения 8000 байтами
+    max_payload = 7900
+    reconnect_delay = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, topics):
+        self._start_listener()
+        return super().subscribe(topics)
+
+    def publish_many(self, messages):
+        payloads = []
+        for topic, data in messages:
+            payload = json.dumps({"t": topic, "d": data}, separators=(",", ":"))
+            if len(payload.encode()) > self.max_payload:
+                logger.warning("Dropping oversized %s message", topic)
+                continue
+            payloads.append(payload)
+        if not payloads:
+            return
+        # Один запрос на пачку сообщений
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                [self.channel, payloads],
+            )
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(
+                target=self._listen, name="broker-listener", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Broker listener failed, reconnecting")
+            time.sleep(self.reconnect_delay)
+
+    def _listen_once(self):
+        params = connections["default"].get_connection_params()
+        conn = psycopg2.connect(**params)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while True:
+                if select.select([conn], [], [], self.reconnect_delay) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    message = json.loads(conn.notifies.pop(0).payload)
+                    self.deliver(message["t"], message["d"])
+        finally:
+            conn.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Брокер процесса; класс задает настройка REALTIME_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(
+                    settings, "REALTIME_BROKER", "blog.broker.InProcessBroker"
+                )
+                _broker = import_string(path)()
+    return _broker
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from notifications.outbox import user_topic
+from posts.live import post_topic
+
+from .broker import get_broker
+
+# Пустой комментарий раз в столько секунд держит соединение открытым
+# через прокси и выявляет отключившихся клиентов
+KEEPALIVE_SECONDS = 15
+# Предел ?posts= на одно соединение
+MAX_WATCHED_POSTS = 100
+# Через сколько миллисекунд EventSource переподключается после обрыва
+RETRY_MS = 5000
+# Предельная длительность соединения: Django 4.2 под ASGI не замечает
+# отключения клиента, и без предела подписка ушедшего клиента жила бы
+# вечно. Клиент переподключается через RETRY_MS
+STREAM_MAX_SECONDS = 300
+
+
+def _watched_posts(request):
+    try:
+        ids = {int(pk) for pk in request.GET.get("posts", "").split(",") if pk}
+    except ValueError:
+        return None
+    return ids if len(ids) <= MAX_WATCHED_POSTS else None
+
+
+def _authenticate(request):
+    """Пользователь по тем же аутентификаторам, что и у API: сессия или JWT."""
+    return Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    ).user
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _stream(topics):
+    # Подписка создается и закрывается в самом генераторе: не начатый
+    # поток ничего не держит, законченный всегда отписывается
+    subscription = get_broker().subscribe(topics)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_SECONDS
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                topic, data = await asyncio.wait_for(
+                    subscription.get(), min(KEEPALIVE_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _event(
+                "counters" if topic.startswith("post:") else "notification", data
+            )
+    finally:
+        subscription.close()
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events: новые уведомления пользователя (event: notification)
+    и сводные приращения счетчиков постов из ?posts=1,2,3 (event: counters).
+    Одно долгое соединение вместо периодических опросов. Аутентификация как
+    у API: сессия или Authorization: Bearer <JWT>. Работает только под
+    ASGI-сервером, например uvicorn blog.asgi:application.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        # WSGI дочитывал бы бесконечный поток в память
+        return JsonResponse({"error": "Event stream requires ASGI"}, status=501)
+    post_ids = _watched_posts(request)
+    if post_ids is None:
+        return JsonResponse(
+            {"error": f"posts must be up to {MAX_WATCHED_POSTS} comma-separated ids"},
+            status=400,
+        )
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except APIException as exc:
+        return JsonResponse({"error": str(exc.detail)}, status=exc.status_code)
+    user_id = user.pk
+    topics = [post_topic(pk) for pk in post_ids]
+    if user_id is not None:
+        topics.append(user_topic(user_id))
+    if not topics:
+        return JsonResponse({"error": "Nothing to watch"}, status=400)
+
+    response = StreamingHttpResponse(_stream(topics), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx не должен буферизовать поток
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,50 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class Fieldset:
+    """
+    Поля ответа, запрошенные клиентом: ?fields=a,b оставляет только
+    перечисленные, ?exclude=a,b и ?omit=a,b убирают поля. Действует
+    только на чтение, запись всегда видит все поля сериализатора.
+    """
+
+    def __init__(self, only=None, exclude=()):
+        self.only = only
+        self.exclude = set(exclude)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = getattr(request, "query_params", request.GET)
+        only = _split(params["fields"]) if params.get("fields") else None
+        exclude = _split(params.get("exclude", "")) | _split(params.get("omit", ""))
+        return cls(only, exclude)
+
+    def wants(self, name):
+        if name in self.exclude:
+            return False
+        return self.only is None or name in self.only
+
+    def deferred(self, names):
+        """Поля модели из names, которые можно не читать из БД."""
+        return [name for name in names if not self.wants(name)]
+
+
+class SparseFieldsetsMixin:
+    """
+    Сериализатор отдает только поля из Fieldset запроса. Вложенные
+    сериализаторы не фильтруются: ?fields= относится к верхнему уровню.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if self is not root and getattr(root, "child", None) is not self:
+            return fields
+        fieldset = Fieldset.from_request(self.context.get("request"))
+        return {name: field for name, field in fields.items() if fieldset.wants(name)}
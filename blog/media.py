@@ -0,0 +1,176 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+# Имена ContentAddressedStorage: содержимое по такому пути не меняется
+HASHED_NAME = re.compile(r"(^|/)[0-9a-f]{64}\.[A-Za-z0-9]+$")
+# Варианты изображений posts/images.py: каталог назван хэшем исходника
+# и параметров обработки, содержимое тоже не меняется
+VARIANT_NAME = re.compile(r"(^|/)variants/\d+/[0-9a-f]{12}/\w+\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def media_settings():
+    return (
+        getattr(settings, "MEDIA_SERVE_MODE", "django"),
+        getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/"),
+        getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600),
+    )
+
+
+def _resolve(path):
+    # Скрытые каталоги (временные файлы загрузки) наружу не отдаются
+    parts = posixpath.normpath(path).split("/")
+    if any(part.startswith(".") for part in parts):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, *parts)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+    return full_path, st
+
+
+def _etag(path, st):
+    match = HASHED_NAME.search(path)
+    if match:
+        return quote_etag(posixpath.splitext(path.rsplit("/", 1)[-1])[0])
+    return quote_etag(f"{st.st_size:x}-{st.st_mtime_ns:x}")
+
+
+def parse_range(header, size):
+    """
+    (start, end) включительно для одного диапазона Range, None если
+    заголовка нет или он не поддерживается, "unsatisfiable" для 416.
+    Несколько диапазонов не поддерживаются: отдается весь файл.
+    """
+    match = RANGE_HEADER.match(header.replace(" ", "")) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: последние N байт
+        length = int(last)
+        if not length:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def _if_range_matches(request, etag, modified):
+    value = request.META.get("HTTP_IF_RANGE")
+    if not value:
+        return True
+    if value.startswith(('"', "W/")):
+        return value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and int(modified) <= since
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    """
+    Отдача файлов из MEDIA_ROOT: If-None-Match/If-Modified-Since, Range,
+    бессрочное кэширование файлов с хэшем в имени. При MEDIA_SERVE_MODE
+    "x-accel" или "x-sendfile" сами байты отдает фронтенд-сервер.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    full_path, st = _resolve(path)
+    mode, accel_prefix, max_age = media_settings()
+    etag = _etag(path, st)
+    modified = st.st_mtime
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(modified))
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or "application/octet-stream"
+        if mode == "x-accel":
+            # nginx сам отдаст файл и обработает Range. Заголовок — URI:
+            # не-ASCII имена Django закодировал бы по RFC 2047, и nginx
+            # не нашел бы файл, поэтому кодируем процентами
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = quote(accel_prefix + path)
+        elif mode == "x-sendfile" and quote(full_path) == full_path:
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = full_path
+        else:
+            # Путь X-Sendfile с символами, требующими кодирования, отдаем
+            # сами: декодирует ли его сервер, зависит от его настроек
+            response = _file_response(request, full_path, st, content_type, etag)
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified)
+    response["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL
+        if HASHED_NAME.search(path) or VARIANT_NAME.search(path)
+        else f"public, max-age={max_age}"
+    )
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def _file_response(request, full_path, st, content_type, etag):
+    size = st.st_size
+    byte_range = None
+    if _if_range_matches(request, etag, st.st_mtime):
+        byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    if byte_range is None:
+        # Весь файл: FileResponse использует wsgi.file_wrapper (sendfile)
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,307 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Порядок выдачи по умолчанию; id разрешает совпадения по времени
+DEFAULT_ORDERING = ("-created_at", "-id")
+
+
+def encode_cursor(position, reverse=False):
+    values = [
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in position
+    ]
+    payload = json.dumps({"p": values, "r": int(reverse)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload["p"]), bool(payload.get("r"))
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _ordering_field(queryset, name):
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    meta = queryset.model._meta
+    return meta.pk if name == "pk" else meta.get_field(name)
+
+
+def clean_position(queryset, ordering, position):
+    """
+    Приводит значения позиции из курсора к типам полей ordering. Курсор
+    приходит от клиента: подделанный дает ValueError вместо ошибки БД.
+    """
+    if len(position) != len(ordering):
+        raise ValueError("Invalid cursor")
+    values = []
+    for field, value in zip(ordering, position):
+        model_field = _ordering_field(queryset, field.lstrip("-"))
+        try:
+            value = model_field.to_python(value)
+            if value is None:
+                raise ValueError("Invalid cursor")
+            # Диапазон целых полей: иначе переполнение всплывет в PostgreSQL
+            model_field.run_validators(value)
+        except (TypeError, ValidationError) as exc:
+            raise ValueError("Invalid cursor") from exc
+        values.append(value)
+    return values
+
+
+def _flip(ordering):
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+def _after(ordering, position):
+    """
+    Условие «строго после position» для порядка ordering:
+    (a < x) OR (a = x AND b < y) ... плюс ведущая граница a <= x для индекса.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": position[i]})
+        for prev, value in zip(ordering[:i], position):
+            step &= Q(**{prev.lstrip("-"): value})
+        condition |= step
+    first = ordering[0]
+    bound = "lte" if first.startswith("-") else "gte"
+    return Q(**{f"{first.lstrip('-')}__{bound}": position[0]}) & condition
+
+
+def _position(row, ordering):
+    names = [field.lstrip("-") for field in ordering]
+    if isinstance(row, dict):
+        return [row[name] for name in names]
+    return [getattr(row, name) for name in names]
+
+
+class KeysetPage:
+    """Страница keyset-пагинации: без номера страницы и общего числа строк."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, page_size, cursor=None, ordering=DEFAULT_ORDERING):
+    """
+    Возвращает страницу queryset после (или до) позиции из cursor.
+    Стоимость любой страницы одинакова: индексный поиск вместо OFFSET.
+    Поля ordering должны быть NOT NULL, последнее — уникальным.
+    """
+    ordering = list(ordering)
+    position, reverse = decode_cursor(cursor) if cursor else (None, False)
+    if position is not None:
+        position = clean_position(queryset, ordering, position)
+
+    order = _flip(ordering) if reverse else ordering
+    queryset = queryset.order_by(*order)
+    if position is not None:
+        queryset = queryset.filter(_after(order, position))
+
+    rows = list(queryset[: page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows, None, None)
+
+    has_next = has_more if not reverse else True
+    has_previous = position is not None if not reverse else has_more
+    return KeysetPage(
+        rows,
+        encode_cursor(_position(rows[-1], ordering)) if has_next else None,
+        (
+            encode_cursor(_position(rows[0], ordering), reverse=True)
+            if has_previous
+            else None
+        ),
+    )
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану PostgreSQL вместо COUNT(*)."""
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация DRF по view.keyset_ordering (по умолчанию
+    created_at, id). Общее число строк только по запросу: ?count=estimate
+    (по плану запроса) или ?count=exact.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size_query_param = "page_size"
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    # Порядок выдачи; по умолчанию берется view.keyset_ordering
+    ordering = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        ordering = self.ordering or getattr(view, "keyset_ordering", DEFAULT_ORDERING)
+        try:
+            self.page = paginate_keyset(
+                queryset,
+                self.get_page_size(request),
+                request.query_params.get(self.cursor_query_param) or None,
+                ordering,
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor.")
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_count(self):
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return self.queryset.count()
+        if mode:
+            return estimate_count(self.queryset)
+        return None
+
+    def get_paginated_response(self, data):
+        payload = {
+            "next": self.get_link(self.page.next_cursor),
+            "previous": self.get_link(self.page.previous_cursor),
+        }
+        count = self.get_count()
+        if count is not None:
+            payload["count"] = count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "count": {"type": "integer"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор страницы (пустой — первая страница)",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "estimate или exact — добавить в ответ count",
+                "schema": {"type": "string", "enum": ["estimate", "exact"]},
+            },
+        ]
+
+
+class FeedPagination(PageNumberPagination):
+    """
+    Постраничная пагинация по умолчанию; при наличии параметра ?cursor
+    (в том числе пустого) включается KeysetPagination.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(
+            view
+        ) + KeysetPagination().get_schema_operation_parameters(view)
+
+
+class KeysetPaginationMixin:
+    """Keyset-пагинация для ListView: ссылки ?cursor= вместо ?page=N."""
+
+    keyset_ordering = DEFAULT_ORDERING
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate_keyset(
+                queryset,
+                page_size,
+                self.request.GET.get("cursor") or None,
+                self.keyset_ordering,
+            )
+        except ValueError:
+            raise Http404("Invalid cursor")
+        url = self.request.get_full_path()
+        page.first_link = remove_query_param(url, "cursor")
+        page.next_link = page.next_cursor and replace_query_param(
+            url, "cursor", page.next_cursor
+        )
+        page.previous_link = page.previous_cursor and replace_query_param(
+            url, "cursor", page.previous_cursor
+        )
+        return None, page, page.object_list, page.has_other_pages()
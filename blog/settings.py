@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "drf_spectacular",
     "posts",
@@ -140,7 +141,7 @@ LOGOUT_REDIRECT_URL = 'post_list'
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "blog.pagination.FeedPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
@@ -149,6 +150,47 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Период (в секундах) сброса буферизированных счетчиков в БД, см. posts/counters.py
+COUNTERS_FLUSH_INTERVAL = float(os.environ.get("COUNTERS_FLUSH_INTERVAL", "5"))
+# 0 — без фонового потока: в БД пишет только явный flush(). Тесты запускаются
+# с 0, см. blog/test_runner.py
+TEST_RUNNER = "blog.test_runner.BlogTestRunner"
+# Сколько дней хранить дневные скетчи уникальных зрителей
+UNIQUE_VIEWS_RETENTION_DAYS = 90
+# Число строк-шардов счетчика лайков поста (1 — писать прямо в posts_post)
+LIKE_COUNTER_SHARDS = int(os.environ.get("LIKE_COUNTER_SHARDS", "8"))
+
+# Кэш фрагментов шаблонов (см. posts/fragments.py). Локальная память годится
+# для одного процесса; при нескольких воркерах нужен общий бэкенд, например
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и CACHE_LOCATION=redis://...
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+# Конфигурация PostgreSQL для полнотекстового поиска, см. posts/search.py
+SEARCH_CONFIG = os.environ.get("SEARCH_CONFIG", "russian")
+# Отдавать список и карточку поста в API быстрым путем без PostSerializer,
+# см. posts/fastpath.py; ответ тот же байт в байт
+POSTS_FAST_READ = os.environ.get("POSTS_FAST_READ", "False") == "True"
+# Время жизни закэшированных фрагментов постов, секунды
+POST_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("POST_FRAGMENT_CACHE_TIMEOUT", "3600"))
+# Потоков обработки изображений постов, см. posts/images.py; 0 — прямо в запросе
+POST_IMAGE_WORKERS = int(os.environ.get("POST_IMAGE_WORKERS", "2"))
+# Лента ?ordering=hot: сколько секунд новизны стоят десятикратной активности поста
+HOT_DECAY_SECONDS = int(os.environ.get("HOT_DECAY_SECONDS", "45000"))
+# Кто создает уведомления из outbox: "thread" — фоновый поток веб-процесса,
+# "command" — отдельный процесс manage.py dispatch_notifications
+NOTIFICATIONS_DISPATCH = os.environ.get("NOTIFICATIONS_DISPATCH", "thread")
+# Окно схлопывания однотипных уведомлений об одной цели, секунды; 0 — выключено
+NOTIFICATIONS_COALESCE_WINDOW = int(os.environ.get("NOTIFICATIONS_COALESCE_WINDOW", "86400"))
+# Брокер push-канала /api/events/ (см. blog/broker.py): InProcessBroker для одного
+# ASGI-воркера, blog.broker.PostgresBroker (LISTEN/NOTIFY) для нескольких
+REALTIME_BROKER = os.environ.get("REALTIME_BROKER", "blog.broker.InProcessBroker")
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Blog Lite API",
     "DESCRIPTION": "API для сервиса блогов",
@@ -173,6 +215,13 @@ CSRF_TRUSTED_ORIGINS = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Как отдаются медиафайлы, см. blog/media.py: "django" — самим Django,
+# "x-accel" — через X-Accel-Redirect nginx (internal-локейшн с префиксом
+# MEDIA_ACCEL_PREFIX, указывающий на MEDIA_ROOT), "x-sendfile" — Apache/lighttpd
+MEDIA_SERVE_MODE = os.environ.get("MEDIA_SERVE_MODE", "django")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+# Время кэширования медиафайлов без хэша в имени, секунды
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", "3600"))
 
 
 print("DB_NAME:", repr(os.environ.get("DB_NAME")))
@@ -0,0 +1,19 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class BlogTestRunner(DiscoverRunner):
+    """
+    Тесты без фонового потока сброса счетчиков (см. posts/counters.py):
+    поток со своим соединением не видит данных незафиксированной транзакции
+    теста, поэтому в БД пишет только явный flush().
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._counters = override_settings(COUNTERS_FLUSH_INTERVAL=0)
+        self._counters.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._counters.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,21 +1,25 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from posts.views import (PostViewSet, SubPostViewSet, PostListView, PostDetailView,
-                         PostCreateView, PostUpdateView, post_delete)
+                         PostCreateView, PostUpdateView, PostSearchView, ExportView,
+                         post_delete)
 from accounts.views import SignUpView, MyPostsListView
 from interactions.views import (CommentViewSet, FavoriteViewSet,
                                comment_delete, FavoritesListView)
-from notifications.views import InboxView, NotificationMarkAsReadView
+from notifications.views import InboxView, NotificationMarkAsReadView, NotificationViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import views as auth_views
 from rest_framework_nested import routers
 from django.conf import settings
-from django.conf.urls.static import static
+from urllib.parse import urlsplit
+import re
+from blog.media import serve_media
+from blog.events import event_stream
 
 
 # Создаем роутер для API
@@ -24,6 +28,7 @@ router.register(r"posts", PostViewSet, basename="post")
 router.register(r"subposts", SubPostViewSet, basename="subpost")
 router.register(r"comments", CommentViewSet, basename="comment")
 router.register(r"favorites", FavoriteViewSet, basename="favorite")
+router.register(r"notifications", NotificationViewSet, basename="notification")
 posts_router = routers.NestedDefaultRouter(router, r'posts', lookup='post')
 posts_router.register(r'comments', CommentViewSet, basename='post-comments')
 
@@ -49,6 +54,8 @@ urlpatterns = [
     # Основные API endpoints
     path("api/", include(router.urls)),
     path("api/", include(posts_router.urls)),
+    path("api/export/<str:dataset>/", ExportView.as_view(), name="export"),
+    path("api/events/", event_stream, name="events"),
 
     # Аутентификация JWT
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
@@ -70,6 +77,7 @@ urlpatterns = [
     # Фронтенд URLs
     path('', PostListView.as_view(), name='post_list'),
     path('posts/<int:pk>/', PostDetailView.as_view(), name='post_detail'),
+    path('search/', PostSearchView.as_view(), name='post_search'),
     path('posts/create/', PostCreateView.as_view(), name='post_create'),
     path('posts/<int:pk>/edit/', PostUpdateView.as_view(), name='post_edit'),
     path('my-posts/', MyPostsListView.as_view(), name='my_posts'),
@@ -80,5 +88,13 @@ urlpatterns = [
     path('api/notifications/<int:pk>/mark_read/', NotificationMarkAsReadView.as_view(), name='notification_mark_read'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Медиафайлы: в продакшене при MEDIA_SERVE_MODE=x-accel/x-sendfile байты
+# отдает фронтенд-сервер, см. blog/media.py
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns += [
+        re_path(
+            r"^%s(?P<path>.+)$" % re.escape(settings.MEDIA_URL.lstrip("/")),
+            serve_media,
+            name="media",
+        ),
+    ]
\ No newline at end of file
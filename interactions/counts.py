@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Post
+
+from .models import Comment, CommentLike
+
+# Строк родительской таблицы за одну транзакцию сверки
+RECONCILE_BATCH_SIZE = 1000
+
+
+def comment_added(comment):
+    """Новый комментарий: +1 посту и +1 ответу родителя. Вызывается в транзакции INSERT."""
+    Post.objects.filter(pk=comment.post_id).update(comment_count=F("comment_count") + 1)
+    if comment.parent_comment_id:
+        Comment.objects.filter(pk=comment.parent_comment_id).update(
+            reply_count=F("reply_count") + 1
+        )
+
+
+def _deleted_with(origin, model):
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+def comment_removed(comment, origin=None):
+    """
+    Комментарий удален, в том числе каскадом. Счетчики строк, которые
+    удаляются тем же вызовом delete(), не трогаются: при удалении поста
+    это все его комментарии, при удалении ветки — все ответы внутри нее.
+    Возвращает False, если удаляется сам пост.
+    """
+    if _deleted_with(origin, Post):
+        return False
+    Post.objects.filter(pk=comment.post_id, comment_count__gt=0).update(
+        comment_count=F("comment_count") - 1
+    )
+    # Ответ внутри удаляемой ветки origin: его родитель удаляется тоже
+    in_branch = isinstance(origin, Comment) and origin.pk != comment.pk
+    if comment.parent_comment_id and not in_branch:
+        Comment.objects.filter(pk=comment.parent_comment_id, reply_count__gt=0).update(
+            reply_count=F("reply_count") - 1
+        )
+    return True
+
+
+def _actual(child, parent_field):
+    rows = (
+        child.objects.filter(**{parent_field: OuterRef("pk")})
+        .order_by()
+        .values(parent_field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+# (модель, поле счетчика, дочерняя модель, поле ссылки на родителя)
+COUNTERS = (
+    (Post, "comment_count", Comment, "post"),
+    (Comment, "reply_count", Comment, "parent_comment"),
+    (Comment, "like_count", CommentLike, "comment"),
+)
+
+
+def reconcile_counts(batch_size=RECONCILE_BATCH_SIZE, on_batch=None):
+    """
+    Сверяет счетчики COUNTERS с фактическим числом строк порциями
+    по id и исправляет только разошедшиеся. Значение пересчитывается в том же
+    UPDATE, поэтому параллельные комментарии не теряются.
+    Возвращает {поле: число исправленных строк}.
+    """
+    repaired = {}
+    for model, field, child, parent_field in COUNTERS:
+        repaired[field] = 0
+        last_id = 0
+        while True:
+            ids = list(
+                model.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                drifted = list(
+                    model.objects.filter(pk__in=ids)
+                    .alias(actual=_actual(child, parent_field))
+                    .exclude(**{field: F("actual")})
+                    .values_list("pk", flat=True)
+                )
+                if drifted:
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: _actual(child, parent_field)}
+                    )
+            repaired[field] += len(drifted)
+            if on_batch:
+                on_batch(field, last_id, repaired[field])
+    return repaired
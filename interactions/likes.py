@@ -0,0 +1,56 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Comment, CommentLike
+
+
+def _adjust(comment_id, amount):
+    # Относительное изменение: параллельные лайки не затирают друг друга,
+    # блокировка строки держится только до конца короткой транзакции
+    rows = Comment.objects.filter(pk=comment_id)
+    if amount < 0:
+        rows = rows.filter(like_count__gt=0)
+    rows.update(like_count=F("like_count") + amount)
+
+
+def toggle_comment_like(user, comment_id):
+    """Ставит или снимает лайк. Возвращает (лайкнут ли теперь, like_count)."""
+    with transaction.atomic():
+        deleted, _ = CommentLike.objects.filter(
+            user=user, comment_id=comment_id
+        ).delete()
+        if deleted:
+            _adjust(comment_id, -1)
+        else:
+            try:
+                with transaction.atomic():
+                    CommentLike.objects.create(user=user, comment_id=comment_id)
+            except IntegrityError:
+                # Лайк уже поставлен параллельным запросом
+                pass
+            else:
+                _adjust(comment_id, 1)
+        like_count = (
+            Comment.objects.filter(pk=comment_id)
+            .values_list("like_count", flat=True)
+            .first()
+        )
+    return not deleted, like_count
+
+
+def attach_liked_state(comments, user):
+    """
+    Проставляет liked_by_me комментариям страницы одним запросом по
+    уникальному индексу (user, comment). Возвращает comments.
+    """
+    comments = list(comments)
+    liked = set()
+    if user.is_authenticated and comments:
+        liked = set(
+            CommentLike.objects.filter(
+                user=user, comment_id__in=[comment.pk for comment in comments]
+            ).values_list("comment_id", flat=True)
+        )
+    for comment in comments:
+        comment.liked_by_me = comment.pk in liked
+    return comments
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from interactions.counts import RECONCILE_BATCH_SIZE, reconcile_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет Post.comment_count, Comment.reply_count и Comment.like_count "
+        "с фактическим числом строк порциями по id и исправляет расхождения, "
+        "например после bulk_create или правок в обход ORM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        def progress(field, last_id, repaired):
+            self.stdout.write(
+                f"{field}: проверено до id {last_id}, исправлено {repaired}"
+            )
+
+        repaired = reconcile_counts(batch_size, on_batch=progress)
+        summary = ", ".join(f"{field}: {count}" for field, count in repaired.items())
+        self.stdout.write(self.style.SUCCESS(f"Готово, исправлено строк — {summary}"))
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0002_comment_interactions_comment_feed_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.TextField(db_collation="C", default="", editable=False),
+        ),
+        # Пути существующих комментариев: обход дерева от корней
+        migrations.RunSQL(
+            """
+            WITH RECURSIVE tree (id, path, depth) AS (
+                SELECT id, lpad(to_hex(id), 10, '0'), 0
+                FROM interactions_comment
+                WHERE parent_comment_id IS NULL
+              UNION ALL
+                SELECT c.id, t.path || lpad(to_hex(c.id), 10, '0'), t.depth + 1
+                FROM interactions_comment c
+                JOIN tree t ON c.parent_comment_id = t.id
+            )
+            UPDATE interactions_comment c
+            SET path = tree.path, depth = tree.depth
+            FROM tree
+            WHERE c.id = tree.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "path"], name="interactions_comment_path_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("depth", 0)),
+                fields=["post", "-created_at", "-id"],
+                name="interactions_comment_root_idx",
+            ),
+        ),
+    ]
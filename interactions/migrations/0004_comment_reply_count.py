@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0003_comment_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="reply_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE interactions_comment p
+            SET reply_count = c.total
+            FROM (
+                SELECT parent_comment_id, count(*) AS total
+                FROM interactions_comment
+                WHERE parent_comment_id IS NOT NULL
+                GROUP BY parent_comment_id
+            ) c
+            WHERE c.parent_comment_id = p.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
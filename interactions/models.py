@@ -1,9 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from posts.models import Post
 
 User = settings.AUTH_USER_MODEL
 
+# Ширина id комментария в path и предельная глубина ответа
+PATH_SEGMENT_WIDTH = 10
+MAX_COMMENT_DEPTH = 32
+
+
+def path_segment(pk):
+    return format(pk, f'0{PATH_SEGMENT_WIDTH}x')
+
+
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, related_name="likes", on_delete=models.CASCADE)
@@ -27,13 +36,57 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     like_count = models.PositiveIntegerField(default=0)
+    # Число прямых ответов, см. interactions/counts.py
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    # Материализованный путь: id предков и самого комментария, по
+    # PATH_SEGMENT_WIDTH hex-символов на уровень. Сортировка по path дает
+    # обход дерева в глубину, поддерево — диапазон path по префиксу.
+    # Коллация "C": побайтовое сравнение, индекс работает для LIKE 'префикс%'
+    path = models.TextField(db_collation='C', default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='interactions_comment_feed_idx'),
+            models.Index(fields=['post', 'path'], name='interactions_comment_path_idx'),
+            # Корневые ветки поста по убыванию времени, см. interactions/threads.py
+            models.Index(
+                fields=['post', '-created_at', '-id'],
+                condition=models.Q(depth=0),
+                name='interactions_comment_root_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author} on {self.post}'
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.path:
+            return super().save(*args, **kwargs)
+        # path включает собственный id, который известен только после INSERT
+        parent = self.parent_comment
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = (parent.path if parent else '') + path_segment(self.pk)
+            self.depth = parent.depth + 1 if parent else 0
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+
+
+class CommentLike(models.Model):
+    # Без created_at и отдельного индекса по user: уникальный индекс
+    # (user, comment) обслуживает и переключение, и состояние страницы
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='comment_likes')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='likes')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'comment'], name='interactions_commentlike_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} likes comment {self.comment_id}'
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -1,13 +1,26 @@
 from rest_framework import serializers
-from .models import Comment, Favorite
+from blog.fieldsets import SparseFieldsetsMixin
+from .models import MAX_COMMENT_DEPTH, Comment, Favorite
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
+    parent_comment = serializers.PrimaryKeyRelatedField(
+        queryset=Comment.objects.only('id', 'post_id', 'path', 'depth'),
+        required=False,
+        allow_null=True,
+    )
+    # Проставляет view, см. interactions/likes.py
+    liked_by_me = serializers.BooleanField(read_only=True, default=False)
 
     class Meta:
         model = Comment
-        fields = ['id', 'text', 'author']
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        fields = [
+            'id', 'text', 'author', 'parent_comment', 'depth', 'reply_count',
+            'like_count', 'liked_by_me', 'created_at',
+        ]
+        read_only_fields = [
+            'id', 'author', 'depth', 'reply_count', 'like_count', 'created_at', 'updated_at',
+        ]
 
     def validate(self, data):
         """
@@ -15,9 +28,30 @@ class CommentSerializer(serializers.ModelSerializer):
         """
         if not data.get('text', '').strip():
             raise serializers.ValidationError({"text": "Комментарий не может быть пустым"})
+        parent = data.get('parent_comment')
+        if parent is not None:
+            # Ответ только на комментарий того же поста, post_id задает view
+            if str(parent.post_id) != str(self.context.get('post_id')):
+                raise serializers.ValidationError(
+                    {"parent_comment": "Comment belongs to another post."}
+                )
+            if parent.depth + 1 > MAX_COMMENT_DEPTH:
+                raise serializers.ValidationError(
+                    {"parent_comment": "Thread is too deep."}
+                )
         return data
 
 
+class CommentThreadSerializer(CommentSerializer):
+    """Корневой комментарий с первыми ответами ветки, см. interactions/threads.py."""
+
+    replies = CommentSerializer(many=True, read_only=True)
+    has_more_replies = serializers.BooleanField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies', 'has_more_replies']
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     post_title = serializers.CharField(source='post.title', read_only=True)
     author_username = serializers.CharField(source='post.author.username', read_only=True)
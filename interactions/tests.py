@@ -1,3 +1,256 @@
-from django.test import TestCase
+import os
+import secrets
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from blog.pagination import encode_cursor
+from notifications.models import Notification
+from notifications.outbox import dispatch_events
+from posts.models import Post
+
+from .counts import reconcile_counts
+from .models import Comment, CommentLike
+
+User = get_user_model()
+
+
+class CommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader", password=secrets.token_urlsafe(8)
+        )
+        self.post = Post.objects.create(title="Post", body="Body", author=self.user)
+        self.client.force_authenticate(self.user)
+
+    def comment(self, parent=None, text="Hi"):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent_comment=parent
+        )
+
+    def threads(self, **params):
+        url = reverse("post-comments-threads", kwargs={"post_pk": self.post.pk})
+        return self.client.get(url, params)
+
+    def test_reply_via_api_gets_path_and_depth(self):
+        root = self.comment()
+        url = reverse("post-comments-list", kwargs={"post_pk": self.post.pk})
+        resp = self.client.post(url, {"text": "Ответ", "parent_comment": root.pk})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["depth"], 1)
+        reply = Comment.objects.get(pk=resp.data["id"])
+        self.assertEqual(reply.path, root.path + format(reply.pk, "010x"))
+
+        other = Post.objects.create(title="Other", body="Body", author=self.user)
+        foreign = Comment.objects.create(post=other, author=self.user, text="x")
+        resp = self.client.post(url, {"text": "Ответ", "parent_comment": foreign.pk})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("parent_comment", resp.data)
+
+    def test_threads_cap_replies_and_paginate_roots(self):
+        first = self.comment(text="first")
+        node = first
+        for _ in range(5):
+            node = self.comment(parent=node)
+        second = self.comment(text="second")
+        self.comment(parent=second)
+        third = self.comment(text="third")
+
+        resp = self.threads(page_size=2, replies=2)
+        self.assertEqual(resp.status_code, 200)
+        results = resp.data["results"]
+        self.assertEqual([t["id"] for t in results], [third.pk, second.pk])
+        self.assertEqual(
+            (results[0]["replies"], results[0]["has_more_replies"]), ([], False)
+        )
+        self.assertEqual(len(results[1]["replies"]), 1)
+
+        resp = self.client.get(resp.data["next"])
+        (thread,) = resp.data["results"]
+        self.assertEqual(thread["id"], first.pk)
+        self.assertEqual([r["depth"] for r in thread["replies"]], [1, 2])
+        self.assertTrue(thread["has_more_replies"])
+        self.assertIsNone(resp.data["next"])
+        self.assertEqual(self.threads(cursor="garbage").status_code, 404)
+        # Корректно закодированный курсор с подделанными значениями
+        for position in (["not-a-date", 1], [first.created_at, "1; --"], [[1], {}]):
+            cursor = encode_cursor(position)
+            self.assertEqual(self.threads(cursor=cursor).status_code, 404, position)
+
+    def test_threads_query_count_is_constant(self):
+        def count():
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.threads(replies=5).status_code, 200)
+            return len(ctx.captured_queries)
+
+        root = self.comment()
+        self.comment(parent=root)
+        small = count()
+        for _ in range(3):
+            root = self.comment()
+            node = root
+            for _ in range(20):
+                node = self.comment(parent=node)
+                self.comment(parent=root)
+        self.assertEqual(count(), small)
+
+    def test_subtree_in_tree_order_with_cursor(self):
+        root = self.comment()
+        a = self.comment(parent=root)
+        b = self.comment(parent=root)
+        a1 = self.comment(parent=a)
+        self.comment()
+
+        url = reverse(
+            "post-comments-thread", kwargs={"post_pk": self.post.pk, "pk": root.pk}
+        )
+        seen, page = [], url + "?page_size=2"
+        while page:
+            resp = self.client.get(page)
+            self.assertEqual(resp.status_code, 200)
+            seen += [item["id"] for item in resp.data["results"]]
+            page = resp.data["next"]
+        self.assertEqual(seen, [a.pk, a1.pk, b.pk])
+
+
+class CommentCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="counter", password=secrets.token_urlsafe(8)
+        )
+        self.post = Post.objects.create(title="Post", body="Body", author=self.user)
+        self.root = self.comment()
+        self.reply = self.comment(parent=self.root)
+        self.nested = self.comment(parent=self.reply)
+
+    def comment(self, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text="Hi", parent_comment=parent
+        )
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.comment_count, dict(
+            Comment.objects.values_list("pk", "reply_count")
+        )
+
+    def test_create_and_cascade_delete(self):
+        other = self.comment(parent=self.root)
+        self.assertEqual(
+            self.counts(),
+            (4, {self.root.pk: 2, self.reply.pk: 1, self.nested.pk: 0, other.pk: 0}),
+        )
+        # Ветка reply удаляется целиком, у root остается один ответ
+        self.reply.delete()
+        self.assertEqual(self.counts(), (2, {self.root.pk: 1, other.pk: 0}))
+
+    def test_post_delete_skips_counter_updates(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.post.delete()
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse(
+            [q for q in sql if q.startswith("UPDATE") and "comment_count" in q]
+        )
+
+    def test_exposed_in_api_and_detail_page(self):
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(reverse("post-detail", args=[self.post.pk]))
+        self.assertEqual(resp.data["comment_count"], 3)
+        url = reverse("post-comments-list", kwargs={"post_pk": self.post.pk})
+        results = self.client.get(url).data["results"]
+        self.assertEqual({c["id"]: c["reply_count"] for c in results}[self.root.pk], 1)
+        page = self.client.get(reverse("post_detail", args=[self.post.pk]))
+        self.assertContains(page, "Комментарии (3)")
+
+    def test_reconcile_repairs_drift(self):
+        Post.objects.filter(pk=self.post.pk).update(comment_count=10)
+        Comment.objects.filter(pk=self.root.pk).update(reply_count=0)
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, author=self.user, text="Bulk")]
+        )
+        self.assertEqual(
+            reconcile_counts(batch_size=1),
+            {"comment_count": 1, "reply_count": 1, "like_count": 0},
+        )
+        self.assertEqual(self.counts()[0], 4)
+        self.assertEqual(Comment.objects.get(pk=self.root.pk).reply_count, 1)
+        call_command("reconcile_comment_counts", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            reconcile_counts(), {"comment_count": 0, "reply_count": 0, "like_count": 0}
+        )
+
+
+class CommentLikeTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="writer", password=secrets.token_urlsafe(8)
+        )
+        self.reader = User.objects.create_user(
+            username="liker", password=secrets.token_urlsafe(8)
+        )
+        self.post = Post.objects.create(title="Post", body="Body", author=self.author)
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.author, text="Hi"
+        )
+        self.client.force_authenticate(self.reader)
+
+    def like(self, comment=None):
+        comment = comment or self.comment
+        url = reverse(
+            "post-comments-like", kwargs={"post_pk": comment.post_id, "pk": comment.pk}
+        )
+        return self.client.post(url)
+
+    def test_toggle_updates_counter_and_notifies(self):
+        resp = self.like()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data, {"status": "liked", "like_count": 1})
+        dispatch_events()
+        self.assertTrue(
+            Notification.objects.filter(
+                recipient=self.author, notification_type="like_comment"
+            ).exists()
+        )
+        resp = self.like()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {"status": "unliked", "like_count": 0})
+        self.assertFalse(CommentLike.objects.exists())
+
+    def test_like_requires_matching_post(self):
+        other = Post.objects.create(title="Other", body="Body", author=self.author)
+        url = reverse(
+            "post-comments-like", kwargs={"post_pk": other.pk, "pk": self.comment.pk}
+        )
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_liked_state_in_one_query_per_page(self):
+        replies = [
+            Comment.objects.create(
+                post=self.post,
+                author=self.author,
+                text="Re",
+                parent_comment=self.comment,
+            )
+            for _ in range(3)
+        ]
+        self.like(replies[1])
+        url = reverse("post-comments-threads", kwargs={"post_pk": self.post.pk})
+
+        def liked_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url, {"replies": 3})
+            sql = [q["sql"] for q in ctx.captured_queries]
+            return resp, [q for q in sql if CommentLike._meta.db_table in q]
+
+        resp, queries = liked_queries()
+        self.assertEqual(len(queries), 1)
+        thread = resp.data["results"][0]
+        self.assertFalse(thread["liked_by_me"])
+        self.assertEqual(
+            [(r["liked_by_me"], r["like_count"]) for r in thread["replies"]],
+            [(False, 0), (True, 1), (False, 0)],
+        )
@@ -0,0 +1,89 @@
+from django.db.models import prefetch_related_objects
+
+from blog.pagination import clean_position, decode_cursor, encode_cursor
+
+from .models import Comment
+
+# Корневых веток на странице и ответов в каждой по умолчанию
+THREADS_PAGE_SIZE = 10
+MAX_THREADS_PAGE_SIZE = 50
+THREAD_REPLIES = 3
+MAX_THREAD_REPLIES = 50
+# Больше любого символа path: [path, path || PATH_END) — все поддерево
+PATH_END = "~"
+# Порядок корневых веток, в нем же позиция курсора
+THREADS_ORDERING = ("-created_at", "-id")
+
+# Для каждой корневой ветки страницы отдельный индексный диапазон по
+# (post_id, path) с LIMIT: стоимость не зависит от размера веток
+_THREADS_SQL = """
+SELECT reply.*
+FROM (
+    SELECT id, path, created_at
+    FROM {table}
+    WHERE post_id = %s AND depth = 0 {after}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s
+) root
+CROSS JOIN LATERAL (
+    SELECT *
+    FROM {table} c
+    WHERE c.post_id = %s AND c.path >= root.path AND c.path < root.path || %s
+    ORDER BY c.path
+    LIMIT %s
+) reply
+ORDER BY root.created_at DESC, root.id DESC, reply.path
+"""
+
+
+def load_threads(post_id, limit=THREADS_PAGE_SIZE, replies=THREAD_REPLIES, cursor=None):
+    """
+    Страница корневых комментариев поста (новые сначала) и до replies
+    первых ответов каждой ветки в порядке обхода дерева. Один запрос к
+    комментариям и один к авторам независимо от глубины и размера веток.
+
+    Возвращает (ветки, курсор следующей страницы или None). У каждой ветки
+    есть replies и has_more_replies. Некорректный cursor — ValueError.
+    """
+    after, params = "", [post_id]
+    if cursor:
+        position, _ = decode_cursor(cursor)
+        # Значения уходят в сырой SQL: приводим к типам полей до запроса
+        position = clean_position(Comment.objects.all(), THREADS_ORDERING, position)
+        after = "AND (created_at, id) < (%s, %s)"
+        params += position
+    # +1 ветка — признак следующей страницы, +2 строки — корень и признак
+    # того, что ответов больше
+    params += [limit + 1, post_id, PATH_END, replies + 2]
+    sql = _THREADS_SQL.format(table=Comment._meta.db_table, after=after)
+
+    threads = []
+    for comment in Comment.objects.raw(sql, params):
+        if comment.depth == 0:
+            comment.replies = []
+            threads.append(comment)
+        else:
+            threads[-1].replies.append(comment)
+
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        last = threads[-1]
+        next_cursor = encode_cursor([last.created_at, last.pk])
+    for thread in threads:
+        thread.has_more_replies = len(thread.replies) > replies
+        thread.replies = thread.replies[:replies]
+
+    prefetch_related_objects(
+        threads + [reply for thread in threads for reply in thread.replies], "author"
+    )
+    return threads, next_cursor
+
+
+def subtree(comment):
+    """Все ответы на comment на любой глубине; порядок по path — обход дерева."""
+    return Comment.objects.filter(
+        post_id=comment.post_id,
+        path__gt=comment.path,
+        path__lt=comment.path + PATH_END,
+    )
@@ -1,5 +1,5 @@
 from .models import Favorite, Comment
-from interactions.serializers import FavoriteSerializer, CommentSerializer
+from interactions.serializers import FavoriteSerializer, CommentSerializer, CommentThreadSerializer
 from django.core.exceptions import PermissionDenied
 from rest_framework import viewsets, status
 from posts.models import Post
@@ -9,6 +9,17 @@ from rest_framework.permissions import IsAuthenticated
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
+from blog.fieldsets import Fieldset
+from blog.pagination import KeysetPagination
+from drf_spectacular.utils import OpenApiResponse, extend_schema
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.utils.urls import replace_query_param
+from .likes import attach_liked_state, toggle_comment_like
+from .threads import (
+    MAX_THREAD_REPLIES, MAX_THREADS_PAGE_SIZE, THREAD_REPLIES, THREADS_PAGE_SIZE,
+    load_threads, subtree,
+)
 
 
 
@@ -49,16 +60,103 @@ class CommentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_pk')
-        return Comment.objects.filter(post_id=post_id).order_by('-created_at')
+        comments = Comment.objects.filter(post_id=post_id)
+        fieldset = Fieldset.from_request(self.request)
+        if fieldset.wants('author'):
+            comments = comments.select_related('author')
+        comments = comments.defer(*fieldset.deferred(['text']))
+        return comments.order_by('-created_at')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        # liked_by_me всей страницы одним запросом
+        return page if page is None else attach_liked_state(page, self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Для проверки, что parent_comment из того же поста
+        context['post_id'] = self.kwargs.get('post_pk')
+        return context
 
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_pk')
         post = get_object_or_404(Post, id=post_id)
         serializer.save(author=self.request.user, post=post)
 
+    @extend_schema(
+        description=(
+            "Корневые комментарии поста (новые сначала) с первыми ответами "
+            "каждой ветки: ?replies= ответов на ветку, ?page_size= веток, "
+            "?cursor= следующая страница"
+        ),
+        responses={200: CommentThreadSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'])
+    def threads(self, request, post_pk=None):
+        try:
+            post_id = int(post_pk)
+        except (TypeError, ValueError):
+            raise NotFound('Post not found.')
+        limit = _bounded_int(request, 'page_size', THREADS_PAGE_SIZE, MAX_THREADS_PAGE_SIZE)
+        replies = _bounded_int(request, 'replies', THREAD_REPLIES, MAX_THREAD_REPLIES)
+        try:
+            threads, next_cursor = load_threads(
+                post_id, limit, replies, request.query_params.get('cursor') or None
+            )
+        except ValueError:
+            raise NotFound('Invalid cursor.')
+        attach_liked_state(
+            threads + [reply for thread in threads for reply in thread.replies],
+            request.user,
+        )
+        serializer = CommentThreadSerializer(
+            threads, many=True, context=self.get_serializer_context()
+        )
+        next_link = next_cursor and replace_query_param(
+            request.build_absolute_uri(), 'cursor', next_cursor
+        )
+        return Response({'next': next_link, 'results': serializer.data})
+
+    @extend_schema(
+        description="Все ответы на комментарий на любой глубине в порядке обхода дерева"
+    )
+    @action(detail=True, methods=['get'])
+    def thread(self, request, post_pk=None, pk=None):
+        comment = self.get_object()
+        paginator = KeysetPagination()
+        paginator.ordering = ('path',)
+        page = paginator.paginate_queryset(
+            subtree(comment).select_related('author'), request, view=self
+        )
+        page = attach_liked_state(page, request.user)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        request=None,
+        description="Поставить/убрать лайк комментария",
+        responses={
+            201: OpenApiResponse(description="Лайк поставлен"),
+            200: OpenApiResponse(description="Лайк убран"),
+        },
+    )
+    @action(detail=True, methods=['post'])
+    def like(self, request, post_pk=None, pk=None):
+        comment = get_object_or_404(
+            Comment.objects.only('id', 'post_id'), pk=pk, post_id=post_pk
+        )
+        liked, like_count = toggle_comment_like(request.user, comment.pk)
+        return Response(
+            {'status': 'liked' if liked else 'unliked', 'like_count': like_count},
+            status=status.HTTP_201_CREATED if liked else status.HTTP_200_OK,
+        )
+
     def create(self, request, *args, **kwargs):
         try:
             return super().create(request, *args, **kwargs)
+        except APIException:
+            # Ошибки валидации и 404 отдаются как есть
+            raise
         except Exception as e:
             # Логируем ошибку для диагностики
             print(f"Error creating comment: {str(e)}")
@@ -73,6 +171,14 @@ class CommentViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 
+def _bounded_int(request, name, default, maximum):
+    try:
+        value = int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+    return max(1, min(value, maximum))
+
+
 def comment_delete(request, pk):
     comment = get_object_or_404(Comment, pk=pk)
     if comment.author != request.user:
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import DISPATCH_BATCH_SIZE, dispatch_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает уведомления из событий outbox пачками. Несколько процессов "
+        "можно запускать параллельно: события распределяются через SKIP LOCKED. "
+        "При NOTIFICATIONS_DISPATCH=command это единственный разборщик."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DISPATCH_BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="Пауза в секундах, когда outbox пуст",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Разобрать outbox и выйти"
+        )
+
+    def handle(self, *args, batch_size, interval, once, **options):
+        total = 0
+        while True:
+            count = dispatch_events(batch_size)
+            total += count
+            if count:
+                self.stdout.write(f"Разобрано {total} событий")
+                continue
+            if once:
+                break
+            close_old_connections()
+            time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS(f"Готово: {total} событий"))
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_notificationevent"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="notification",
+            options={"ordering": ["-updated_at"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notif_recipient_feed_idx",
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="actor_count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="group_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="recent_senders",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE notifications_notification
+            SET updated_at = created_at, recent_senders = jsonb_build_array(sender_id)
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "-updated_at", "-id"],
+                name="notif_recipient_feed_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                fields=("recipient", "group_key"), name="notif_recipient_group_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("notifications", "0004_notification_coalescing"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationReadState",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("read_until", models.DateTimeField()),
+            ],
+        ),
+    ]
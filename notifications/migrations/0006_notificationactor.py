@@ -0,0 +1,65 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("notifications", "0005_notificationreadstate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationActor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "notification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="actors",
+                        to="notifications.notification",
+                    ),
+                ),
+                (
+                    "sender",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="notificationactor",
+            constraint=models.UniqueConstraint(
+                fields=("notification", "sender"), name="notif_actor_uniq"
+            ),
+        ),
+        # Для существующих групп известны только последние отправители
+        migrations.RunSQL(
+            """
+            INSERT INTO notifications_notificationactor (notification_id, sender_id)
+            SELECT n.id, u.id
+            FROM notifications_notification n
+            CROSS JOIN LATERAL jsonb_array_elements_text(n.recent_senders) AS s(id)
+            JOIN auth_user u ON u.id = s.id::bigint
+            WHERE n.group_key IS NOT NULL
+            ON CONFLICT DO NOTHING
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from interactions.models import Post, Comment
 
 
@@ -26,9 +27,80 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Однотипные уведомления об одной цели за окно схлопываются в одну
+    # строку, см. notifications/outbox.py: sender и updated_at — последнее
+    # событие, actor_count — сколько разных отправителей (их список —
+    # NotificationActor), recent_senders — id нескольких последних из них
+    group_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    actor_count = models.PositiveIntegerField(default=1)
+    recent_senders = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notif_recipient_feed_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'group_key'], name='notif_recipient_group_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.sender.username} -> {self.recipient.username}: {self.get_notification_type_display()}"
\ No newline at end of file
+        return f"{self.sender.username} -> {self.recipient.username}: {self.get_notification_type_display()}"
+
+
+class NotificationActor(models.Model):
+    """
+    Отправитель схлопнутого уведомления. Каждый отправитель увеличивает
+    actor_count один раз, сколько бы раз он ни повторял действие,
+    см. notifications/outbox.py.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actors')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'sender'], name='notif_actor_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender_id} in {self.notification_id}"
+
+
+class NotificationReadState(models.Model):
+    """
+    Отметка прочтения: все уведомления пользователя с updated_at не позже
+    read_until прочитаны. «Прочитать все» меняет одну эту строку вместо
+    UPDATE по всем уведомлениям, см. notifications/unread.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    read_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} read until {self.read_until}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Запись outbox: сигнал взаимодействия пишет ее в своей же транзакции,
+    а уведомления из нее пачками создает dispatcher, см. notifications/outbox.py.
+    Цели хранятся просто id: событие не блокирует удаление поста или
+    комментария, исчезнувшие цели dispatcher пропускает.
+    """
+    COMMENT = 'comment'
+    LIKE_POST = 'like_post'
+    LIKE_COMMENT = 'like_comment'
+    KINDS = (
+        (COMMENT, 'Комментарий'),
+        (LIKE_POST, 'Лайк поста'),
+        (LIKE_COMMENT, 'Лайк комментария'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='+')
+    post_id = models.BigIntegerField(null=True, blank=True)
+    comment_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.kind} by {self.actor_id}"
@@ -0,0 +1,329 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from blog.broker import get_broker
+from interactions.models import Comment
+from posts.counters import flusher
+from posts.models import Post
+
+from .models import Notification, NotificationActor, NotificationEvent
+from .unread import invalidate_unread
+
+logger = logging.getLogger(__name__)
+
+# Событий за одну транзакцию dispatcher
+DISPATCH_BATCH_SIZE = 500
+# Сколько пачек разбирать за один вызов из потока сброса
+DISPATCH_MAX_BATCHES = 20
+# Сколько последних отправителей хранит схлопнутое уведомление
+RECENT_SENDERS_LIMIT = 3
+# Цель, по которой схлопываются уведомления каждого типа
+COALESCE_TARGETS = {
+    "like_post": "post_id",
+    "comment_post": "post_id",
+    "like_comment": "comment_id",
+    "reply_comment": "parent_comment_id",
+}
+
+
+def dispatch_mode():
+    """
+    "thread" — события разбирает фоновый поток каждого веб-процесса,
+    "command" — только отдельный процесс dispatch_notifications.
+    """
+    return getattr(settings, "NOTIFICATIONS_DISPATCH", "thread")
+
+
+def coalesce_window():
+    """Окно схлопывания в секундах; 0 — каждое событие отдельной строкой."""
+    return getattr(settings, "NOTIFICATIONS_COALESCE_WINDOW", 86400)
+
+
+def record(kind, actor_id, post_id=None, comment_id=None):
+    """
+    Пишет событие outbox в текущей транзакции: один INSERT без чтения
+    связанных строк. Уведомления появятся после фиксации.
+    """
+    NotificationEvent.objects.create(
+        kind=kind, actor_id=actor_id, post_id=post_id, comment_id=comment_id
+    )
+    transaction.on_commit(dispatcher.wake)
+
+
+def build_notifications(events):
+    """Уведомления для пачки событий: по одному запросу к комментариям и постам."""
+    comment_ids = {event.comment_id for event in events if event.comment_id}
+    comments = {
+        row["pk"]: row
+        for row in Comment.objects.filter(pk__in=comment_ids).values(
+            "pk",
+            "post_id",
+            "parent_comment_id",
+            "post__author_id",
+            "parent_comment__author_id",
+            "author_id",
+        )
+    }
+    post_ids = {
+        event.post_id for event in events if event.kind == NotificationEvent.LIKE_POST
+    }
+    post_authors = dict(
+        Post.objects.filter(pk__in=post_ids).values_list("pk", "author_id")
+    )
+
+    notifications = []
+
+    def notify(event, recipient_id, notification_type, **targets):
+        # О собственных действиях не уведомляем
+        if recipient_id and recipient_id != event.actor_id:
+            notifications.append(
+                Notification(
+                    recipient_id=recipient_id,
+                    sender_id=event.actor_id,
+                    notification_type=notification_type,
+                    recent_senders=[event.actor_id],
+                    # Время события для окна схлопывания; при сохранении
+                    # заменяется временем разбора, см. store_notifications()
+                    updated_at=event.created_at,
+                    **targets,
+                )
+            )
+
+    for event in events:
+        if event.kind == NotificationEvent.LIKE_POST:
+            if event.post_id in post_authors:
+                notify(
+                    event,
+                    post_authors[event.post_id],
+                    "like_post",
+                    post_id=event.post_id,
+                )
+            continue
+        comment = comments.get(event.comment_id)
+        if comment is None:
+            # Комментарий удалили до разбора события
+            continue
+        targets = {"post_id": comment["post_id"], "comment_id": comment["pk"]}
+        if event.kind == NotificationEvent.LIKE_COMMENT:
+            notify(event, comment["author_id"], "like_comment", **targets)
+            continue
+        notify(event, comment["post__author_id"], "comment_post", **targets)
+        if comment["parent_comment_id"]:
+            notify(
+                event,
+                comment["parent_comment__author_id"],
+                "reply_comment",
+                parent_comment_id=comment["parent_comment_id"],
+                **targets,
+            )
+    return notifications
+
+
+def _recent(newer, older):
+    """Отправители без повторов, новые первыми, не больше RECENT_SENDERS_LIMIT."""
+    return list(dict.fromkeys(newer + older))[:RECENT_SENDERS_LIMIT]
+
+
+def coalesce(notifications, window):
+    """
+    Сливает уведомления пачки с одинаковыми получателем, типом, целью и
+    окном времени. Уведомления идут в порядке событий, поэтому более позднее
+    задает отправителя, комментарий и updated_at.
+    Возвращает [(уведомление, множество отправителей)].
+    """
+    groups = {}
+    for notification in notifications:
+        bucket = int(notification.updated_at.timestamp() // window)
+        target = getattr(notification, COALESCE_TARGETS[notification.notification_type])
+        notification.group_key = f"{notification.notification_type}:{target}:{bucket}"
+        key = (notification.recipient_id, notification.group_key)
+        if key not in groups:
+            groups[key] = (notification, {notification.sender_id})
+            continue
+        group, senders = groups[key]
+        senders.add(notification.sender_id)
+        group.sender_id = notification.sender_id
+        group.comment_id = notification.comment_id
+        group.updated_at = notification.updated_at
+        group.recent_senders = _recent([notification.sender_id], group.recent_senders)
+        group.actor_count = len(senders)
+    return list(groups.values())
+
+
+def store_notifications(notifications):
+    """
+    Сохраняет уведомления пачки, схлопывая их со строками текущего окна:
+    один SELECT ... FOR UPDATE, один SELECT отправителей, один UPDATE и
+    по одному INSERT уведомлений и отправителей на пачку. Число строк
+    уведомлений растет с числом разных целей, а не взаимодействий.
+    Возвращает созданные и обновленные строки.
+    """
+    window = coalesce_window()
+    if not window or not notifications:
+        now = timezone.now()
+        for notification in notifications:
+            notification.updated_at = now
+        return Notification.objects.bulk_create(notifications)
+    # Окно группы считается по времени событий
+    groups = coalesce(notifications, window)
+    existing = {
+        (row.recipient_id, row.group_key): row
+        for row in Notification.objects.select_for_update().filter(
+            recipient_id__in={group.recipient_id for group, _ in groups},
+            group_key__in={group.group_key for group, _ in groups},
+        )
+    }
+    # Строки групп заблокированы выше, поэтому список отправителей
+    # до конца транзакции меняет только этот dispatcher
+    known = set()
+    if existing:
+        known = set(
+            NotificationActor.objects.filter(
+                notification__in=list(existing.values()),
+                sender_id__in={sender for _, senders in groups for sender in senders},
+            ).values_list("notification_id", "sender_id")
+        )
+    created, updated, actors = [], [], []
+    for group, senders in groups:
+        row = existing.get((group.recipient_id, group.group_key))
+        if row is None:
+            created.append((group, senders))
+            continue
+        # Повторное действие того же отправителя счетчик не увеличивает
+        new_senders = {sender for sender in senders if (row.pk, sender) not in known}
+        actors += [
+            NotificationActor(notification=row, sender_id=s) for s in new_senders
+        ]
+        row.actor_count += len(new_senders)
+        row.recent_senders = _recent(group.recent_senders, row.recent_senders)
+        row.sender_id = group.sender_id
+        row.comment_id = group.comment_id
+        row.is_read = False
+        updated.append(row)
+    # updated_at — время разбора, а не события: параллельные dispatcher
+    # фиксируются не по порядку событий, а отметка прочтения — время
+    # пометки, см. notifications/unread.py
+    now = timezone.now()
+    for row in updated:
+        row.updated_at = now
+    for group, _ in created:
+        group.updated_at = now
+    Notification.objects.bulk_update(
+        updated,
+        [
+            "actor_count",
+            "recent_senders",
+            "sender",
+            "comment",
+            "updated_at",
+            "is_read",
+        ],
+    )
+    # Параллельный dispatcher мог создать ту же группу: IntegrityError
+    # откатывает пачку, при повторе она схлопнется с созданной строкой
+    stored = Notification.objects.bulk_create([group for group, _ in created])
+    actors += [
+        NotificationActor(notification=group, sender_id=sender)
+        for group, senders in created
+        for sender in senders
+    ]
+    NotificationActor.objects.bulk_create(actors)
+    return stored + updated
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+def notification_message(notification):
+    """Компактное представление уведомления для push-канала."""
+    return {
+        "id": notification.pk,
+        "notification_type": notification.notification_type,
+        "sender": notification.sender_id,
+        "actor_count": notification.actor_count,
+        "post": notification.post_id,
+        "comment": notification.comment_id,
+        "updated_at": notification.updated_at.isoformat(),
+    }
+
+
+def _delivered(notifications):
+    invalidate_unread(*{notification.recipient_id for notification in notifications})
+    try:
+        get_broker().publish_many(
+            [
+                (
+                    user_topic(notification.recipient_id),
+                    notification_message(notification),
+                )
+                for notification in notifications
+            ]
+        )
+    except Exception:
+        # Уведомления уже сохранены, клиент увидит их при следующем запросе
+        logger.exception("Failed to publish notifications")
+
+
+def dispatch_events(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Разбирает одну пачку событий. skip_locked позволяет нескольким
+    dispatcher работать параллельно без повторной доставки. Если пачка
+    упала, события остаются в outbox до следующего прохода.
+    Возвращает число разобранных событий.
+    """
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.select_for_update(skip_locked=True).order_by(
+                "pk"
+            )[:batch_size]
+        )
+        if not events:
+            return 0
+        stored = store_notifications(build_notifications(events))
+        transaction.on_commit(lambda: _delivered(stored))
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+    return len(events)
+
+
+class NotificationDispatcher:
+    """
+    Разбор outbox в фоновом потоке сброса счетчиков: после фиксации
+    транзакции с событием поток будится и разбирает все накопившееся.
+    """
+
+    def __init__(self):
+        # При старте процесса в outbox могли остаться события
+        self._pending = threading.Event()
+        self._pending.set()
+        flusher.register(self.run)
+
+    def wake(self):
+        if dispatch_mode() != "thread":
+            return
+        self._pending.set()
+        flusher.start()
+
+    def run(self):
+        if dispatch_mode() != "thread" or not self._pending.is_set():
+            return 0
+        self._pending.clear()
+        dispatched = 0
+        try:
+            for _ in range(DISPATCH_MAX_BATCHES):
+                count = dispatch_events()
+                dispatched += count
+                if count < DISPATCH_BATCH_SIZE:
+                    return dispatched
+        except Exception:
+            logger.exception("Failed to dispatch notification events")
+        # Ошибка или outbox не разобран до конца: продолжим при следующем сбросе
+        self._pending.set()
+        return dispatched
+
+
+dispatcher = NotificationDispatcher()
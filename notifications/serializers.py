@@ -1,21 +1,32 @@
 from rest_framework import serializers
+from blog.fieldsets import SparseFieldsetsMixin
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from .models import Notification
+from .unread import is_unread
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     sender = serializers.StringRelatedField()
     post_title = serializers.SerializerMethodField()
     comment_text = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
         fields = [
             'id', 'sender', 'notification_type',
             'post', 'post_title', 'comment', 'comment_text',
-            'created_at', 'is_read'
+            'actor_count', 'recent_senders',
+            'created_at', 'updated_at', 'is_read'
         ]
         read_only_fields = fields
 
+    @extend_schema_field(OpenApiTypes.BOOL)
+    def get_is_read(self, obj):
+        # Отметку прочтения передает view, см. notifications/unread.py
+        return not is_unread(obj, self.context.get('read_until'))
+
     def get_post_title(self, obj):
         return obj.post.title if obj.post else None
 
@@ -1,3 +1,213 @@
-from django.test import TestCase
+import os
+import secrets
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from interactions.models import Comment, CommentLike, Like
+from posts.models import Post
+
+from .models import Notification, NotificationEvent
+from .outbox import dispatch_events
+
+User = get_user_model()
+
+
+class NotificationOutboxTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", password=secrets.token_urlsafe(8)
+        )
+        self.reader = User.objects.create_user(
+            username="reader", password=secrets.token_urlsafe(8)
+        )
+        self.post = Post.objects.create(title="Post", body="Body", author=self.author)
+
+    def notifications(self):
+        return sorted(
+            Notification.objects.values_list("recipient__username", "notification_type")
+        )
+
+    def test_signals_only_write_outbox(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Like.objects.create(user=self.reader, post=self.post)
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertEqual(
+            len([q for q in sql if NotificationEvent._meta.db_table in q]), 1
+        )
+        self.assertFalse([q for q in sql if Notification._meta.db_table + '"' in q])
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+        self.assertEqual(dispatch_events(), 1)
+        self.assertEqual(self.notifications(), [("author", "like_post")])
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_dispatch_resolves_recipients_in_batch(self):
+        root = Comment.objects.create(post=self.post, author=self.author, text="Root")
+        for _ in range(5):
+            reply = Comment.objects.create(
+                post=self.post, author=self.reader, text="Re", parent_comment=root
+            )
+        CommentLike.objects.create(user=self.reader, comment=root)
+        # Свой лайк и удаленная до разбора цель уведомлений не дают
+        CommentLike.objects.create(user=self.reader, comment=reply)
+        gone = Comment.objects.create(post=self.post, author=self.reader, text="Gone")
+        gone.delete()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(dispatch_events(), 9)
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.assertEqual(
+            self.notifications(),
+            [("author", "comment_post"), ("author", "like_comment")]
+            + [("author", "reply_comment")],
+        )
+
+    def test_command_drains_outbox(self):
+        Comment.objects.create(post=self.post, author=self.reader, text="Hi")
+        call_command(
+            "dispatch_notifications",
+            "--once",
+            "--batch-size=1",
+            stdout=open(os.devnull, "w"),
+        )
+        self.assertEqual(self.notifications(), [("author", "comment_post")])
+
+
+class NotificationCoalescingTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", password=secrets.token_urlsafe(8)
+        )
+        self.fans = [
+            User.objects.create_user(
+                username=f"fan{i}", password=secrets.token_urlsafe(8)
+            )
+            for i in range(5)
+        ]
+        self.post = Post.objects.create(title="Post", body="Body", author=self.author)
+
+    def like(self, user):
+        Like.objects.filter(user=user, post=self.post).delete()
+        Like.objects.create(user=user, post=self.post)
+
+    def test_likes_collapse_into_one_row(self):
+        for fan in self.fans[:2]:
+            self.like(fan)
+        dispatch_events()
+        for fan in self.fans[2:] + [self.fans[4]]:
+            self.like(fan)
+        dispatch_events()
+
+        notification = Notification.objects.get(recipient=self.author)
+        ids = [fan.pk for fan in self.fans]
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.recent_senders, [ids[4], ids[3], ids[2]])
+        self.assertEqual(notification.sender_id, ids[4])
+
+        self.client.force_authenticate(self.author)
+        resp = self.client.get(reverse("notification-list"))
+        item = resp.data["results"][0]
+        self.assertEqual((item["actor_count"], item["sender"]), (5, "fan4"))
+
+    def test_repeat_sender_outside_recent_is_counted_once(self):
+        for fan in self.fans:
+            self.like(fan)
+            dispatch_events()
+        # fans[0] давно выпал из recent_senders, но уже учтен
+        for _ in range(3):
+            self.like(self.fans[0])
+            dispatch_events()
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actors.count(), 5)
+        self.assertEqual(notification.recent_senders[0], self.fans[0].pk)
+
+    def test_targets_and_disabled_window_stay_separate(self):
+        other = Post.objects.create(title="Other", body="Body", author=self.author)
+        Like.objects.create(user=self.fans[0], post=other)
+        self.like(self.fans[0])
+        dispatch_events()
+        self.assertEqual(Notification.objects.count(), 2)
+        with override_settings(NOTIFICATIONS_COALESCE_WINDOW=0):
+            self.like(self.fans[1])
+            dispatch_events()
+        self.assertEqual(Notification.objects.count(), 3)
+
+
+class UnreadStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", password=secrets.token_urlsafe(8)
+        )
+        self.reader = User.objects.create_user(
+            username="reader", password=secrets.token_urlsafe(8)
+        )
+        self.post = Post.objects.create(title="Post", body="Body", author=self.author)
+        self.client.force_authenticate(self.author)
+
+    def comment(self):
+        Comment.objects.create(post=self.post, author=self.reader, text="Hi")
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch_events()
+
+    def unread(self):
+        return self.client.get(reverse("notification-unread-count")).data[
+            "unread_count"
+        ]
+
+    def test_badge_is_cached_and_invalidated_on_dispatch(self):
+        self.comment()
+        self.assertEqual(self.unread(), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.unread(), 1)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        with override_settings(NOTIFICATIONS_COALESCE_WINDOW=0):
+            self.comment()
+        self.assertEqual(self.unread(), 2)
+
+    def test_listing_does_not_write_and_mark_all_read(self):
+        self.comment()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse("notification-list"))
+        self.assertFalse([q for q in ctx.captured_queries if "UPDATE" in q["sql"]])
+        self.assertFalse(resp.data["results"][0]["is_read"])
+
+        resp = self.client.post(reverse("notification-mark-all-read"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.unread(), 0)
+        resp = self.client.get(reverse("notification-list"))
+        self.assertTrue(resp.data["results"][0]["is_read"])
+        # Новое событие в той же группе снова делает ее непрочитанной
+        self.comment()
+        self.assertEqual(self.unread(), 1)
+
+    def test_late_dispatch_of_earlier_event_stays_unread(self):
+        self.comment()
+        # Событие произошло раньше, но его разбор зафиксировался уже после
+        # пометки: так бывает при параллельных dispatcher
+        Comment.objects.create(post=self.post, author=self.reader, text="Late")
+        NotificationEvent.objects.update(
+            created_at=Notification.objects.get().updated_at - timedelta(minutes=1)
+        )
+        self.client.post(reverse("notification-mark-all-read"))
+        self.assertEqual(self.unread(), 0)
+        with override_settings(NOTIFICATIONS_COALESCE_WINDOW=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatch_events()
+        self.assertEqual(self.unread(), 1)
+
+    def test_inbox_page_advances_watermark(self):
+        self.comment()
+        self.client.force_login(self.author)
+        resp = self.client.get(reverse("inbox"))
+        self.assertContains(resp, 'class="notification unread"')
+        self.assertEqual(self.unread(), 0)
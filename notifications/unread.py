@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Notification, NotificationReadState
+
+# Счетчик в кэше сбрасывается при каждом изменении, таймаут лишь страхует
+UNREAD_CACHE_TIMEOUT = 600
+
+
+def unread_cache_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def read_until(user_id):
+    """Отметка прочтения пользователя или None, если он ничего не отмечал."""
+    return (
+        NotificationReadState.objects.filter(user_id=user_id)
+        .values_list("read_until", flat=True)
+        .first()
+    )
+
+
+def is_unread(notification, until):
+    return not notification.is_read and (
+        until is None or notification.updated_at > until
+    )
+
+
+def unread_count(user_id):
+    """
+    Число непрочитанных уведомлений. При попадании в кэш — одно чтение
+    ключа; при промахе — отметка и COUNT по индексу (recipient, updated_at).
+    """
+    key = unread_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        unread = Notification.objects.filter(recipient_id=user_id, is_read=False)
+        until = read_until(user_id)
+        if until is not None:
+            unread = unread.filter(updated_at__gt=until)
+        count = unread.count()
+        cache.set(key, count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_unread(*user_ids):
+    cache.delete_many([unread_cache_key(user_id) for user_id in user_ids])
+
+
+def mark_all_read(user_id):
+    """
+    Сдвигает отметку на момент вызова: один INSERT ... ON CONFLICT.
+    Отметка — время пометки, а не updated_at последнего уведомления:
+    уведомление, разобранное позже, получает более поздний updated_at
+    (время разбора, см. notifications/outbox.py) и остается непрочитанным,
+    даже если его событие произошло раньше. Возвращает отметку.
+    """
+    until = timezone.now()
+    NotificationReadState.objects.bulk_create(
+        [NotificationReadState(user_id=user_id, read_until=until)],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["read_until"],
+    )
+    invalidate_unread(user_id)
+    return until
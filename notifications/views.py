@@ -7,6 +7,14 @@ from rest_framework.permissions import IsAuthenticated
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from rest_framework.views import APIView
+from blog.pagination import KeysetPaginationMixin
+from blog.fieldsets import Fieldset
+from drf_spectacular.utils import OpenApiResponse, extend_schema
+from rest_framework.decorators import action
+from .unread import invalidate_unread, is_unread, mark_all_read, read_until, unread_count
+
+# Схлопнутое уведомление поднимается в ленте при каждом новом событии
+NOTIFICATION_ORDERING = ('-updated_at', '-id')
 
 
 class NotificationMarkAsReadView(APIView):
@@ -16,42 +24,77 @@ class NotificationMarkAsReadView(APIView):
         try:
             notification = Notification.objects.get(pk=pk, recipient=request.user)
             notification.is_read = True
-            notification.save()
+            notification.save(update_fields=['is_read'])
+            invalidate_unread(request.user.pk)
             return Response({'status': 'marked as read'}, status=status.HTTP_200_OK)
         except Notification.DoesNotExist:
             return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class InboxView(LoginRequiredMixin, ListView):
+class InboxView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Notification
     template_name = 'posts/inbox.html'
     context_object_name = 'notifications'
     paginate_by = 20
+    keyset_ordering = NOTIFICATION_ORDERING
 
     def get_queryset(self):
-        Notification.objects.filter(
-            recipient=self.request.user,
-            is_read=False
-        ).update(is_read=True)
-
         return Notification.objects.filter(
             recipient=self.request.user
         ).select_related(
             'sender', 'post', 'comment', 'parent_comment', 'post__author'
-        ).order_by('-created_at')
+        ).order_by(*NOTIFICATION_ORDERING)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user_id = self.request.user.pk
+        until = read_until(user_id)
+        for notification in context['notifications']:
+            notification.unread = is_unread(notification, until)
+        # Открытие первой страницы входящих отмечает все прочитанным: одна
+        # строка NotificationReadState вместо UPDATE по всем уведомлениям
+        if not self.request.GET.get('cursor'):
+            mark_all_read(user_id)
+        return context
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = NOTIFICATION_ORDERING
 
     def get_queryset(self):
-        Notification.objects.filter(
-            recipient=self.request.user,
-            is_read=False
-        ).update(is_read=True)
+        # Связанные строки читаем только для запрошенных полей
+        fieldset = Fieldset.from_request(self.request)
+        related = {
+            'sender': 'sender',
+            'post_title': 'post',
+            'comment_text': 'comment',
+        }
+        notifications = Notification.objects.filter(recipient=self.request.user)
+        joins = [model for field, model in related.items() if fieldset.wants(field)]
+        if joins:
+            notifications = notifications.select_related(*joins)
+        return notifications.order_by(*NOTIFICATION_ORDERING)
 
-        return Notification.objects.filter(
-            recipient=self.request.user
-        ).select_related(
-            'sender', 'post', 'comment'
-        ).order_by('-created_at')
\ No newline at end of file
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Список только читает: прочитанность считается по отметке
+        if self.request.user.is_authenticated:
+            context['read_until'] = read_until(self.request.user.pk)
+        return context
+
+    @extend_schema(
+        responses={200: OpenApiResponse(description="Число непрочитанных уведомлений")},
+    )
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': unread_count(request.user.pk)})
+
+    @extend_schema(
+        request=None,
+        responses={200: OpenApiResponse(description="Отметка прочтения сдвинута")},
+    )
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        until = mark_all_read(request.user.pk)
+        return Response({'status': 'marked as read', 'read_until': until})
\ No newline at end of file
@@ -5,4 +5,5 @@ class PostsConfig(AppConfig):
     name = 'posts'
 
     def ready(self):
-        import notifications.signals
\ No newline at end of file
+        import notifications.signals
+        import posts.signals  # noqa: F401
\ No newline at end of file
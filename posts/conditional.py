@@ -0,0 +1,103 @@
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from interactions.models import Comment
+
+from .counters import view_counter
+from .models import SubPost
+
+
+def _children(model):
+    rows = model.objects.filter(post=OuterRef("pk")).order_by().values("post")
+    return (
+        Subquery(rows.annotate(value=Max("updated_at")).values("value")),
+        Subquery(rows.annotate(value=Count("pk")).values("value")),
+    )
+
+
+def with_versions(queryset, comments=False):
+    """
+    Аннотирует время последнего изменения и число подпостов (и время
+    изменения комментариев; их число хранит Post.comment_count): по ним
+    валидаторы видят правки дочерних строк без их выборки.
+    """
+    updated, count = _children(SubPost)
+    queryset = queryset.annotate(subposts_updated=updated, subposts_count=count)
+    if comments:
+        updated, _ = _children(Comment)
+        queryset = queryset.annotate(comments_updated=updated)
+    return queryset
+
+
+def prefetched_subposts(post):
+    """Подпосты, если они были предзагружены; иначе пусто, без запроса."""
+    return getattr(post, "_prefetched_objects_cache", {}).get("subposts", ())
+
+
+def post_state(post):
+    """
+    Все, от чего зависит представление поста в API, без сериализации.
+    Не запрошенные клиентом части (?fields=) не читаются.
+    """
+    if hasattr(post, "subposts_count"):
+        subposts = (post.subposts_updated, post.subposts_count)
+    else:
+        subposts = [(sp.pk, sp.updated_at) for sp in prefetched_subposts(post)]
+    return (
+        post.pk,
+        post.updated_at,
+        post.current_views_count,
+        post.unique_views_count,
+        getattr(post, "like_total", None),
+        getattr(post, "liked_by_me", False),
+        getattr(post, "favorited_by_me", False),
+        subposts,
+    )
+
+
+def row_state(row):
+    """То же для словаря из values() с аннотациями with_versions()."""
+    return (
+        row["pk"],
+        row["updated_at"],
+        row["views_count"] + view_counter.pending(row["pk"]),
+        row["unique_views_count"],
+        row["like_total"],
+        row["liked_by_me"],
+        row["favorited_by_me"],
+        (row["subposts_updated"], row["subposts_count"]),
+    )
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest())
+
+
+def latest(*values):
+    """Last-Modified отражает правки содержимого; счетчики учитывает только ETag."""
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def not_modified(request, etag, modified=None):
+    """Ответ 304/412 по If-None-Match/If-Modified-Since или None."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=modified and int(modified.timestamp()),
+    )
+    return response and set_validators(response, etag, modified)
+
+
+def set_validators(response, etag, modified=None):
+    response.headers["ETag"] = etag
+    if modified is not None:
+        response.headers["Last-Modified"] = http_date(modified.timestamp())
+    # Ответ зависит от пользователя: liked_by_me, favorited_by_me
+    patch_vary_headers(response, ("Cookie", "Authorization"))
+    return response
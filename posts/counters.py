@@ -0,0 +1,393 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import LikeCounterShard, Post, PostViewSketch
+from .sketches import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк обновлять одним UPDATE ... CASE
+FLUSH_BATCH_SIZE = 500
+
+
+class Flusher:
+    """
+    Фоновый поток процесса, который раз в COUNTERS_FLUSH_INTERVAL секунд
+    вызывает все зарегистрированные функции сброса. При интервале 0 поток
+    не запускается и в БД пишет только явный flush().
+    """
+
+    def __init__(self):
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def register(self, callback):
+        self._callbacks.append(callback)
+        return callback
+
+    def interval(self):
+        return getattr(settings, "COUNTERS_FLUSH_INTERVAL", 5)
+
+    def start(self):
+        if not self.interval():
+            return
+        # После fork поток родителя в дочернем процессе не существует
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            thread = threading.Thread(
+                target=self._run, name="counters-flusher", daemon=True
+            )
+            thread.start()
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def flush(self):
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Error in flush callback %r", callback)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval())
+            try:
+                self.flush()
+            finally:
+                # Не держим соединение с БД открытым между сбросами
+                connections.close_all()
+
+
+flusher = Flusher()
+
+
+class BufferedCounter:
+    """
+    Счетчик с отложенной записью: приращения копятся в памяти процесса
+    и периодически сбрасываются в БД пачкой UPDATE-запросов.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        # Уже забранные на запись, но еще не записанные приращения
+        self._inflight = Counter()
+        # Вызываются с pk после записи их приращений в БД
+        self._subscribers = []
+        # Вызываются с (pk, приращение) при каждом increment()
+        self._listeners = []
+        flusher.register(self.flush)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def listen(self, callback):
+        self._listeners.append(callback)
+        return callback
+
+    def increment(self, pk, amount=1):
+        """Добавляет приращение и возвращает несброшенную дельту для pk."""
+        with self._lock:
+            self._pending[pk] += amount
+            delta = self._pending[pk] + self._inflight[pk]
+        for callback in self._listeners:
+            callback(pk, amount)
+        flusher.start()
+        return delta
+
+    def pending(self, pk):
+        with self._lock:
+            return self._pending[pk] + self._inflight[pk]
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            self._inflight.update(batch)
+        if not batch:
+            return 0
+
+        items = list(batch.items())
+        written = 0
+        try:
+            while written < len(items):
+                chunk = items[written : written + FLUSH_BATCH_SIZE]
+                # UPDATE идет без блокировки буфера: запрос, который держит
+                # строку поста и читает pending(), не должен ждать сброса.
+                # Порция снимается с inflight сразу после записи, поэтому
+                # двойной учет возможен лишь между ними
+                self._write(chunk)
+                with self._lock:
+                    self._settle(chunk)
+                written += len(chunk)
+                for callback in self._subscribers:
+                    callback(*(pk for pk, _ in chunk))
+        except Exception:
+            logger.exception("Failed to flush %s counters", self.field)
+            # Незаписанное возвращаем в буфер до следующего сброса
+            with self._lock:
+                self._settle(items[written:])
+                self._pending.update(dict(items[written:]))
+        return written
+
+    def _settle(self, items):
+        for pk, amount in items:
+            self._inflight[pk] -= amount
+            if not self._inflight[pk]:
+                del self._inflight[pk]
+
+    def _write(self, items):
+        delta = Case(
+            *[When(pk=pk, then=Value(amount)) for pk, amount in items],
+            default=Value(0),
+            output_field=models.IntegerField(),
+        )
+        self.model._default_manager.filter(pk__in=[pk for pk, _ in items]).update(
+            **{self.field: F(self.field) + delta}
+        )
+
+
+view_counter = BufferedCounter(Post, "views_count")
+
+
+class ShardedCounter:
+    """
+    Счетчик поста, разнесенный по нескольким строкам-шардам: параллельные
+    изменения попадают в разные строки и не ждут друг друга на строке поста.
+    Значение — поле поста плюс сумма шардов; фоновый поток периодически
+    переносит накопленные дельты в поле поста.
+    """
+
+    def __init__(self, model, field, shard_model, shards):
+        self.model = model
+        self.field = field
+        self.shard_model = shard_model
+        self.shards = shards
+        self._lock = threading.Lock()
+        # Посты, шарды которых этот процесс менял с прошлого сворачивания
+        self._dirty = set()
+        # Вызываются с (pk, приращение) при каждом add()
+        self._listeners = []
+        flusher.register(self.fold)
+
+    def listen(self, callback):
+        self._listeners.append(callback)
+        return callback
+
+    def add(self, pk, amount):
+        for callback in self._listeners:
+            callback(pk, amount)
+        if self.shards <= 1:
+            self.model._default_manager.filter(pk=pk).update(
+                **{self.field: F(self.field) + amount}
+            )
+            return
+        shard = random.randrange(self.shards)
+        rows = self.shard_model._default_manager.filter(post_id=pk, shard=shard)
+        if not rows.update(delta=F("delta") + amount):
+            # Первое обращение к шарду: создаем строку и повторяем UPDATE
+            self.shard_model._default_manager.bulk_create(
+                [self.shard_model(post_id=pk, shard=shard)], ignore_conflicts=True
+            )
+            rows.update(delta=F("delta") + amount)
+        with self._lock:
+            self._dirty.add(pk)
+        flusher.start()
+
+    def annotate(self, queryset, name="like_total"):
+        deltas = (
+            self.shard_model._default_manager.filter(post_id=OuterRef("pk"))
+            .values("post_id")
+            .annotate(total=Sum("delta"))
+            .values("total")
+        )
+        return queryset.annotate(
+            **{name: F(self.field) + Coalesce(Subquery(deltas), 0)}
+        )
+
+    def value(self, pk):
+        return (
+            self.annotate(self.model._default_manager.filter(pk=pk), "total")
+            .values_list("total", flat=True)
+            .first()
+        )
+
+    def fold(self):
+        with self._lock:
+            post_ids, self._dirty = list(self._dirty), set()
+        folded = 0
+        try:
+            for start in range(0, len(post_ids), FLUSH_BATCH_SIZE):
+                folded += self._fold(post_ids[start : start + FLUSH_BATCH_SIZE])
+        except Exception:
+            logger.exception("Failed to fold %s shards", self.field)
+            with self._lock:
+                self._dirty.update(post_ids)
+        return folded
+
+    def _fold(self, post_ids):
+        with transaction.atomic():
+            locked = list(
+                self.shard_model._default_manager.select_for_update()
+                .filter(post_id__in=post_ids)
+                .exclude(delta=0)
+                .order_by("pk")
+            )
+            totals = Counter()
+            for shard in locked:
+                totals[shard.post_id] += shard.delta
+            delta = Case(
+                *[When(pk=pk, then=Value(n)) for pk, n in totals.items()],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+            # Не уходим в минус, если лайки меняли в обход счетчика
+            self.model._default_manager.filter(pk__in=list(totals)).update(
+                **{self.field: Greatest(F(self.field) + delta, Value(0))}
+            )
+            self.shard_model._default_manager.filter(
+                pk__in=[shard.pk for shard in locked]
+            ).update(delta=0)
+        return len(totals)
+
+
+like_counter = ShardedCounter(
+    Post,
+    "like_count",
+    LikeCounterShard,
+    shards=getattr(settings, "LIKE_COUNTER_SHARDS", 8),
+)
+
+
+class UniqueViewerBuffer:
+    """
+    Копит в памяти процесса HyperLogLog-скетчи зрителей по (пост, день)
+    и периодически вливает их в PostViewSketch. Объем памяти и хранилища
+    ограничен размером скетча и не зависит от числа просмотров.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sketches = {}
+        flusher.register(self.flush)
+
+    def add(self, pk, viewer):
+        key = (pk, timezone.localdate())
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = HyperLogLog()
+            sketch.add(viewer)
+        flusher.start()
+
+    def flush(self):
+        with self._lock:
+            batch, self._sketches = self._sketches, {}
+        if not batch:
+            return 0
+        try:
+            self._write(batch)
+        except Exception:
+            logger.exception("Failed to flush unique viewer sketches")
+            with self._lock:
+                for key, sketch in batch.items():
+                    if key in self._sketches:
+                        sketch.merge(self._sketches[key])
+                    self._sketches[key] = sketch
+            return 0
+        return len(batch)
+
+    def _write(self, batch):
+        # Каждый дневной скетч вливается еще и в скетч за все время
+        updates = {}
+        for (pk, day), sketch in batch.items():
+            updates[(pk, day)] = sketch
+            total = updates.get((pk, None))
+            updates[(pk, None)] = (
+                sketch.copy() if total is None else total.merge(sketch)
+            )
+
+        post_ids = set(
+            Post.objects.filter(pk__in={pk for pk, _ in batch}).values_list(
+                "pk", flat=True
+            )
+        )
+        days = {day for _, day in batch}
+        empty = bytes(HyperLogLog())
+
+        with transaction.atomic():
+            PostViewSketch.objects.bulk_create(
+                [
+                    PostViewSketch(post_id=pk, day=day, registers=empty)
+                    for pk, day in updates
+                    if pk in post_ids
+                ],
+                ignore_conflicts=True,
+            )
+            rows = (
+                PostViewSketch.objects.select_for_update()
+                .filter(post_id__in=post_ids)
+                .filter(Q(day__isnull=True) | Q(day__in=days))
+                .order_by("pk")
+            )
+            changed = []
+            totals = {}
+            for row in rows:
+                sketch = updates.get((row.post_id, row.day))
+                if sketch is None:
+                    continue
+                merged = HyperLogLog(row.registers).merge(sketch)
+                row.registers = bytes(merged)
+                changed.append(row)
+                if row.day is None:
+                    totals[row.post_id] = merged.count()
+            PostViewSketch.objects.bulk_update(changed, ["registers"])
+
+            if totals:
+                Post.objects.filter(pk__in=list(totals)).update(
+                    unique_views_count=Case(
+                        *[When(pk=pk, then=Value(n)) for pk, n in totals.items()],
+                        output_field=models.PositiveIntegerField(),
+                    )
+                )
+
+            retention = getattr(settings, "UNIQUE_VIEWS_RETENTION_DAYS", 90)
+            PostViewSketch.objects.filter(
+                post_id__in=post_ids,
+                day__lt=timezone.localdate() - timedelta(days=retention),
+            ).delete()
+
+
+unique_viewers = UniqueViewerBuffer()
+
+
+def viewer_key(request):
+    """Идентификатор зрителя для подсчета уникальных просмотров."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        return f"session:{session.session_key}"
+    return "anon:{}:{}".format(
+        request.META.get("REMOTE_ADDR", ""), request.META.get("HTTP_USER_AGENT", "")
+    )
@@ -0,0 +1,178 @@
+import csv
+import io
+import zlib
+from dataclasses import dataclass, field
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import serializers
+
+from interactions.models import Comment, Like
+
+from .counters import like_counter
+from .models import Post, SubPost
+
+# Строк за одно обращение к серверному курсору
+EXPORT_CHUNK_SIZE = 2000
+# Размер порции ответа: столько байт копится перед отправкой клиенту
+EXPORT_BUFFER_BYTES = 64 * 1024
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type
+    columns: tuple
+    # Поле, по которому фильтрует ?author=
+    author_field: str
+    # Добавляет к queryset аннотации для sources
+    annotate: object = None
+    # Колонки, которые читаются из аннотации, а не из одноименного поля
+    sources: dict = field(default_factory=dict)
+
+
+DATASETS = {
+    "posts": Dataset(
+        Post,
+        (
+            "id",
+            "author_id",
+            "title",
+            "body",
+            "image",
+            "views_count",
+            "unique_views_count",
+            "like_count",
+            "comment_count",
+            "created_at",
+            "updated_at",
+        ),
+        "author_id",
+        # like_count как в API: поле поста плюс несвернутые шарды счетчика
+        annotate=lambda queryset: like_counter.annotate(queryset, "like_total"),
+        sources={"like_count": "like_total"},
+    ),
+    "subposts": Dataset(
+        SubPost,
+        ("id", "post_id", "title", "body", "created_at", "updated_at"),
+        "post__author_id",
+    ),
+    "comments": Dataset(
+        Comment,
+        (
+            "id",
+            "post_id",
+            "author_id",
+            "parent_comment_id",
+            "text",
+            "like_count",
+            "created_at",
+            "updated_at",
+        ),
+        "author_id",
+    ),
+    "likes": Dataset(Like, ("id", "user_id", "post_id", "created_at"), "user_id"),
+}
+
+
+class ExportFilterSerializer(serializers.Serializer):
+    author = serializers.IntegerField(required=False, min_value=1)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        after, before = attrs.get("created_after"), attrs.get("created_before")
+        if after and before and after >= before:
+            raise serializers.ValidationError(
+                {"created_before": ["Must be later than created_after."]}
+            )
+        return attrs
+
+
+def export_rows(dataset, author=None, created_after=None, created_before=None):
+    """
+    Строки выгрузки в порядке id. Читаются серверным курсором порциями
+    по EXPORT_CHUNK_SIZE, поэтому память не зависит от размера таблицы.
+    """
+    spec = DATASETS[dataset]
+    queryset = spec.model.objects.order_by("pk")
+    if spec.annotate is not None:
+        queryset = spec.annotate(queryset)
+    if author is not None:
+        queryset = queryset.filter(**{spec.author_field: author})
+    if created_after is not None:
+        queryset = queryset.filter(created_at__gte=created_after)
+    if created_before is not None:
+        queryset = queryset.filter(created_at__lt=created_before)
+    names = [spec.sources.get(column, column) for column in spec.columns]
+    return queryset.values_list(*names).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + "\n"
+
+
+def _csv_lines(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(columns)
+    for row in rows:
+        yield line([_csv_cell(value) for value in row])
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def render_export(dataset, rows, output="ndjson", compress=False):
+    """
+    Байтовые порции выгрузки в формате output, при compress — в gzip.
+    Строки собираются в порции около EXPORT_BUFFER_BYTES.
+    """
+    columns = DATASETS[dataset].columns
+    lines = (_csv_lines if output == "csv" else _ndjson_lines)(columns, rows)
+
+    def chunks():
+        parts, size = [], 0
+        for line in lines:
+            parts.append(line)
+            size += len(line)
+            if size >= EXPORT_BUFFER_BYTES:
+                yield "".join(parts).encode()
+                parts, size = [], 0
+        if parts:
+            yield "".join(parts).encode()
+
+    return _gzip(chunks()) if compress else chunks()
+
+
+def export_filename(dataset, output, compress):
+    return f"{dataset}.{output}" + (".gz" if compress else "")
+
+
+def export_content_type(output, compress):
+    if compress:
+        return "application/gzip"
+    return "text/csv" if output == "csv" else "application/x-ndjson"
@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+
+from blog.fieldsets import Fieldset
+
+from .counters import view_counter
+from .images import variant_urls
+from .models import Post, SubPost
+from .serializers import PostSerializer, SubPostSerializer
+
+# Столбцы, нужные пагинации и валидаторам независимо от ?fields=
+REQUIRED_COLUMNS = ("id", "created_at", "updated_at")
+
+
+def fast_read_enabled():
+    return getattr(settings, "POSTS_FAST_READ", False)
+
+
+def ordered_subposts():
+    """Предзагрузка подпостов в том же порядке, что и у быстрого пути."""
+    return Prefetch("subposts", queryset=SubPost.objects.order_by("id"))
+
+
+def _datetime_converter():
+    # То же, что DateTimeField.to_representation в формате ISO 8601
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    fallback = DateTimeField().to_representation
+
+    def convert(value):
+        if not value or tz is None or not timezone.is_aware(value):
+            return fallback(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def _column(name, convert=None):
+    if convert is None:
+        return lambda row: row[name]
+    return lambda row: convert(row[name])
+
+
+def _image_converter(request):
+    storage = Post._meta.get_field("image").storage
+
+    def convert(name):
+        # FileField.to_representation: абсолютный URL при наличии запроса
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+class PostRowSerializer:
+    """
+    Быстрый путь чтения постов: ответ собирается из строк values()
+    заранее подобранными функциями по полям, без ModelSerializer и без
+    экземпляров моделей. Вывод совпадает с PostSerializer байт в байт,
+    включая ?fields=, см. FastReadParityTests.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.fieldset = Fieldset.from_request(request)
+        dt = _datetime_converter()
+        # имя поля -> (столбцы values(), функция строки)
+        available = {
+            "id": (["id"], _column("id")),
+            "title": (["title"], _column("title")),
+            "body": (["body"], _column("body")),
+            "image": (["image"], _column("image", _image_converter(request))),
+            "image_variants": (
+                ["image_variants"],
+                lambda row: variant_urls(row["image_variants"], request),
+            ),
+            "author": (["author_id"], _column("author_id")),
+            "views_count": (
+                ["id", "views_count"],
+                lambda row: row["views_count"] + view_counter.pending(row["id"]),
+            ),
+            "unique_views_count": (
+                ["unique_views_count"],
+                _column("unique_views_count"),
+            ),
+            "like_count": (["like_total"], _column("like_total")),
+            "liked_by_me": (["liked_by_me"], _column("liked_by_me", bool)),
+            "favorited_by_me": (["favorited_by_me"], _column("favorited_by_me", bool)),
+            "comment_count": (["comment_count"], _column("comment_count")),
+            "created_at": (["created_at"], _column("created_at", dt)),
+            "updated_at": (["updated_at"], _column("updated_at", dt)),
+            "subposts": (["id"], lambda row: self._subposts.get(row["id"], [])),
+        }
+        self.fields = [
+            (name, available[name][1])
+            for name in PostSerializer.Meta.fields
+            if self.fieldset.wants(name)
+        ]
+        columns = dict.fromkeys(REQUIRED_COLUMNS)
+        for name, _ in self.fields:
+            columns.update(dict.fromkeys(available[name][0]))
+        self.columns = list(columns)
+        self.subpost_fields = [
+            (name, dt if name in ("created_at", "updated_at") else None)
+            for name in SubPostSerializer.Meta.fields
+        ]
+        self._subposts = {}
+        self._subpost_rows = []
+
+    def prepare(self, queryset):
+        """values() с нужными столбцами; аннотации задает get_queryset()."""
+        # Столбцы сортировки нужны курсору keyset-пагинации
+        columns = dict.fromkeys(self.columns)
+        columns.update(
+            dict.fromkeys(
+                field.lstrip("-")
+                for field in queryset.query.order_by
+                if isinstance(field, str)
+            )
+        )
+        # Подпосты читает load() одним запросом на страницу
+        return queryset.prefetch_related(None).values(*columns)
+
+    def load(self, rows):
+        """Читает подпосты страницы одним запросом, если они нужны."""
+        self._subposts = defaultdict(list)
+        self._subpost_rows = []
+        if not self.fieldset.wants("subposts") or not rows:
+            return rows
+        columns = [
+            "post_id" if name == "post" else name for name, _ in self.subpost_fields
+        ]
+        self._subpost_rows = list(
+            SubPost.objects.filter(post_id__in=[row["id"] for row in rows])
+            .order_by("id")
+            .values_list(*columns)
+        )
+        for values in self._subpost_rows:
+            item = {}
+            for (name, convert), value in zip(self.subpost_fields, values):
+                item[name] = convert(value) if convert else value
+            self._subposts[item["post"]].append(item)
+        return rows
+
+    def state(self, rows):
+        """Данные для ETag: строки страницы, подпосты и несброшенные просмотры."""
+        return (
+            rows,
+            self._subpost_rows,
+            [view_counter.pending(row["id"]) for row in rows],
+        )
+
+    def modified(self, rows):
+        """Все updated_at страницы для Last-Modified."""
+        updated = SubPostSerializer.Meta.fields.index("updated_at")
+        return [row["updated_at"] for row in rows] + [
+            values[updated] for values in self._subpost_rows
+        ]
+
+    def render(self, row):
+        return {name: convert(row) for name, convert in self.fields}
+
+    def render_many(self, rows):
+        return [self.render(row) for row in rows]
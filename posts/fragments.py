@@ -0,0 +1,43 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Ключ версии фрагментов поста; фрагменты шаблонов кэшируются по
+# (id, updated_at, версия), поэтому сброс версии делает их недостижимыми
+VERSION_KEY = "posts:fragments:{}"
+
+
+def fragment_timeout():
+    return getattr(settings, "POST_FRAGMENT_CACHE_TIMEOUT", 3600)
+
+
+def get_versions(post_ids):
+    """Текущие версии фрагментов для постов одной страницы за один запрос к кэшу."""
+    keys = {VERSION_KEY.format(pk): pk for pk in post_ids}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, fragment_timeout())
+        # add не перезаписывает версию, созданную параллельным запросом
+        found.update(cache.get_many(missing))
+    return {pk: found.get(key, "") for key, pk in keys.items()}
+
+
+def attach_versions(posts):
+    posts = list(posts)
+    versions = get_versions([post.pk for post in posts])
+    for post in posts:
+        post.fragment_version = versions[post.pk]
+    return posts
+
+
+def invalidate(post_id):
+    cache.delete(VERSION_KEY.format(post_id))
+
+
+def invalidate_on_commit(post_id):
+    # До коммита параллельный запрос может снова закэшировать старые данные
+    transaction.on_commit(lambda: invalidate(post_id))
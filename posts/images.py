@@ -0,0 +1,208 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .fragments import invalidate
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Варианты изображения поста: имя -> наибольшая ширина в пикселях.
+# Порядок от большего к меньшему: каждый следующий уменьшается из предыдущего
+IMAGE_VARIANTS = {"full": 1600, "card": 720, "thumb": 320}
+# Форматы каждого варианта: WebP для браузеров, JPEG как запасной
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+VARIANTS_DIR = "posts/images/variants"
+
+
+def _variant_dir(post_id, source):
+    # Хэш имени исходника и параметров обработки в пути: новый файл или
+    # новые размеры получают новые URL, поэтому содержимое по URL не меняется
+    # и blog/media.py отдает варианты с бессрочным кэшированием
+    key = repr((source, IMAGE_VARIANTS, IMAGE_FORMATS))
+    digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+    return f"{VARIANTS_DIR}/{post_id}/{digest}"
+
+
+def _flatten(image):
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_variants(fileobj):
+    """
+    Уменьшенные копии изображения: [(имя, ширина, высота, {формат: байты})].
+    Меньше исходника не увеличиваются, совпадающие размеры не дублируются.
+    """
+    with Image.open(fileobj) as original:
+        # JPEG декодируется сразу в уменьшенном масштабе, если это возможно
+        original.draft("RGB", (IMAGE_VARIANTS["full"], IMAGE_VARIANTS["full"]))
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    rendered, widths = [], set()
+    for name, width in IMAGE_VARIANTS.items():
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        if image.width in widths:
+            continue
+        widths.add(image.width)
+        encoded = {}
+        for fmt, (pil_format, options) in IMAGE_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            encoded[fmt] = buffer.getvalue()
+        rendered.append((name, image.width, image.height, encoded))
+    return rendered
+
+
+def _delete_files(storage, variants):
+    for variant in variants.get("variants", {}).values():
+        for fmt in IMAGE_FORMATS:
+            if variant.get(fmt):
+                storage.delete(variant[fmt])
+
+
+def generate_variants(post_id, force=False):
+    """
+    Создает варианты изображения поста и записывает их в image_variants.
+    Возвращает True, если варианты изменились.
+    """
+    post = Post.objects.filter(pk=post_id).only("id", "image", "image_variants").first()
+    if post is None:
+        return False
+    # Варианты принадлежат одному посту и удаляются при замене изображения,
+    # поэтому лежат в обычном хранилище, а не в ContentAddressedStorage
+    storage = default_storage
+    source = post.image.name or ""
+    current = post.image_variants or {}
+    if current.get("source", "") == source and not force:
+        return False
+
+    variants = {}
+    if source:
+        directory = _variant_dir(post.pk, source)
+        with post.image.open("rb") as fileobj:
+            rendered = render_variants(fileobj)
+        for name, width, height, encoded in rendered:
+            variant = {"width": width, "height": height}
+            for fmt, data in encoded.items():
+                path = f"{directory}/{name}.{fmt}"
+                if storage.exists(path):
+                    storage.delete(path)
+                variant[fmt] = storage.save(path, ContentFile(data))
+            variants[name] = variant
+    value = {"source": source, "variants": variants} if source else {}
+
+    # Исходник могли заменить, пока шла обработка: тогда результат не нужен
+    same_source = Q(image=source) if source else Q(image="") | Q(image__isnull=True)
+    updated = Post.objects.filter(same_source, pk=post.pk).update(
+        image_variants=value, updated_at=timezone.now()
+    )
+    if not updated:
+        _delete_files(storage, value)
+        return False
+    if current.get("source") != source:
+        _delete_files(storage, current)
+    invalidate(post.pk)
+    return True
+
+
+def _run(post_id, force=False):
+    try:
+        generate_variants(post_id, force)
+    except Exception:
+        logger.exception("Failed to generate image variants for post %s", post_id)
+    finally:
+        # Соединение потока пула не переиспользуется между задачами
+        connection.close()
+
+
+class ImagePool:
+    """
+    Пул потоков процесса для обработки изображений вне запроса. При
+    POST_IMAGE_WORKERS = 0 задачи выполняются сразу в вызывающем потоке.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def workers(self):
+        return getattr(settings, "POST_IMAGE_WORKERS", 2)
+
+    def submit(self, post_id, force=False):
+        if not self.workers():
+            generate_variants(post_id, force)
+            return None
+        return self._get_executor().submit(_run, post_id, force)
+
+    def _get_executor(self):
+        # После fork потоки пула родителя в дочернем процессе не существуют
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers(), thread_name_prefix="post-images"
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+
+image_pool = ImagePool()
+
+
+def needs_variants(post):
+    return (post.image.name or "") != (post.image_variants or {}).get("source", "")
+
+
+def schedule_variants(post_id):
+    transaction.on_commit(lambda: image_pool.submit(post_id), robust=True)
+
+
+def variant_urls(value, request=None):
+    """
+    Представление image_variants для API: URL вариантов по форматам и
+    готовые строки srcset. None, пока варианты не созданы.
+    """
+    variants = (value or {}).get("variants")
+    if not variants:
+        return None
+
+    def url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    result, srcset = {}, {fmt: [] for fmt in IMAGE_FORMATS}
+    for name in reversed(IMAGE_VARIANTS):
+        if name not in variants:
+            continue
+        variant = variants[name]
+        entry = {"width": variant["width"], "height": variant["height"]}
+        for fmt in IMAGE_FORMATS:
+            entry[fmt] = url(variant[fmt])
+            srcset[fmt].append(f"{entry[fmt]} {variant['width']}w")
+        result[name] = entry
+    result["srcset"] = {fmt: ", ".join(items) for fmt, items in srcset.items()}
+    return result
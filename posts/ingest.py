@@ -0,0 +1,154 @@
+import json
+import zlib
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Post, SubPost
+from .ranking import refresh_scores
+from .search import index_posts
+from .serializers import PostIngestSerializer
+
+# Постов в одной порции: проверка, INSERT постов, INSERT подпостов, индекс
+INGEST_CHUNK_SIZE = 500
+# Подпостов в одном INSERT, чтобы не упереться в лимит параметров запроса
+SUBPOST_BATCH_SIZE = 2000
+# Предельная длина строки NDJSON-импорта
+MAX_LINE_BYTES = 1024 * 1024
+
+
+@dataclass
+class ChunkResult:
+    ids: list = field(default_factory=list)
+    # [(ключ элемента, ошибки валидации)]; ключ — индекс в списке или номер строки
+    errors: list = field(default_factory=list)
+    # Сколько входных элементов обработано с начала импорта
+    processed: int = 0
+    # Ключ последнего элемента порции
+    last_key: object = None
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def ingest_chunks(items, author, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Импортирует посты порциями и выдает ChunkResult по каждой. items —
+    пары (ключ, данные) и может быть генератором: в памяти одновременно
+    только одна порция. Невалидные элементы пропускаются и попадают в errors.
+    """
+    processed = 0
+    for chunk in _chunks(items, chunk_size):
+        result = ingest_chunk(chunk, author)
+        processed += len(chunk)
+        result.processed = processed
+        result.last_key = chunk[-1][0]
+        yield result
+
+
+def ingest_chunk(chunk, author):
+    result = ChunkResult()
+    valid = []
+    for key, item in chunk:
+        serializer = PostIngestSerializer(data=item)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            result.errors.append((key, serializer.errors))
+    if not valid:
+        return result
+
+    with transaction.atomic():
+        posts = Post.objects.bulk_create(
+            [Post(title=d["title"], body=d["body"], author=author) for d in valid]
+        )
+        SubPost.objects.bulk_create(
+            [
+                SubPost(post=post, title=sp["title"], body=sp["body"])
+                for post, data in zip(posts, valid)
+                for sp in data.get("subposts", ())
+            ],
+            batch_size=SUBPOST_BATCH_SIZE,
+        )
+        result.ids = [post.pk for post in posts]
+        # bulk_create не шлет сигналы, поисковый индекс и оценку ленты
+        # обновляем сами
+        index_posts(result.ids)
+        refresh_scores(result.ids)
+    return result
+
+
+def read_ndjson(stream, errors):
+    """
+    Читает NDJSON из потока построчно и выдает (номер строки, объект).
+    Ошибки разбора складываются в errors, пустые строки пропускаются.
+    """
+    line_no = 0
+    while line := stream.readline(MAX_LINE_BYTES + 1):
+        line_no += 1
+        if len(line) > MAX_LINE_BYTES and not line.endswith(b"\n"):
+            # Дочитываем длинную строку до конца, не держа ее в памяти
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(MAX_LINE_BYTES)
+            errors.append((line_no, {"non_field_errors": ["Line is too long."]}))
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            errors.append((line_no, {"non_field_errors": [f"Invalid JSON: {exc}"]}))
+
+
+def _progress(payload):
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def _errors(errors):
+    return [{"line": key, "errors": value} for key, value in sorted(errors)]
+
+
+def import_ndjson(stream, author, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Импорт из NDJSON-потока с отчетом о ходе: после каждой порции строка
+    {"line", "created", "failed", "errors"}, в конце {"done": true, ...}.
+    Каждая порция фиксируется отдельно, при обрыве импорт можно продолжить
+    со следующей строки.
+    """
+    parse_errors = []
+    created = failed = 0
+    line = 0
+    try:
+        for result in ingest_chunks(
+            read_ndjson(stream, parse_errors), author, chunk_size
+        ):
+            errors = parse_errors + result.errors
+            parse_errors.clear()
+            created += len(result.ids)
+            failed += len(errors)
+            line = result.last_key
+            yield _progress(
+                {
+                    "line": line,
+                    "created": created,
+                    "failed": failed,
+                    "errors": _errors(errors),
+                }
+            )
+    except (OSError, EOFError, zlib.error) as exc:
+        # Битый gzip или оборванное соединение
+        yield _progress({"error": f"Broken stream: {exc}"})
+    failed += len(parse_errors)
+    yield _progress(
+        {
+            "done": True,
+            "line": line,
+            "created": created,
+            "failed": failed,
+            "errors": _errors(parse_errors),
+        }
+    )
@@ -0,0 +1,58 @@
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from blog.broker import get_broker
+
+from .counters import flusher, like_counter, view_counter
+
+logger = logging.getLogger(__name__)
+
+
+def post_topic(post_id):
+    return f"post:{post_id}"
+
+
+class LiveCounters:
+    """
+    Копит приращения лайков, просмотров и комментариев постов и при каждом
+    сбросе счетчиков публикует их одним сообщением на пост в тему
+    post_topic(): клиенты получают сводку раз в COUNTERS_FLUSH_INTERVAL,
+    а не событие на каждое взаимодействие.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas = defaultdict(Counter)
+        view_counter.listen(lambda pk, amount: self.add(pk, "views", amount))
+        like_counter.listen(lambda pk, amount: self.add_on_commit(pk, "likes", amount))
+        flusher.register(self.publish)
+
+    def add(self, post_id, field, amount):
+        with self._lock:
+            self._deltas[post_id][field] += amount
+        flusher.start()
+
+    def add_on_commit(self, post_id, field, amount):
+        # Откаченное изменение не должно дойти до клиентов
+        transaction.on_commit(lambda: self.add(post_id, field, amount))
+
+    def publish(self):
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(Counter)
+        messages = [
+            (post_topic(post_id), {"post": post_id, **counts})
+            for post_id, counts in deltas.items()
+            if any(counts.values())
+        ]
+        if messages:
+            try:
+                get_broker().publish_many(messages)
+            except Exception:
+                logger.exception("Failed to publish counter deltas")
+        return len(messages)
+
+
+live_counters = LiveCounters()
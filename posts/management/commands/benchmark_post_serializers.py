@@ -0,0 +1,97 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from posts.counters import like_counter
+from posts.fastpath import PostRowSerializer, ordered_subposts
+from posts.models import Post, SubPost
+from posts.serializers import PostSerializer
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает PostSerializer и быстрый путь posts/fastpath.py на "
+        "страницах разного размера. Данные создаются во временной "
+        "транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000")
+        parser.add_argument("--subposts", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, sizes, subposts, repeat, **options):
+        sizes = [int(size) for size in sizes.split(",")]
+        try:
+            with transaction.atomic():
+                self._seed(max(sizes), subposts)
+                self.stdout.write(
+                    f"{'постов':>8} {'serializer, мс':>16} {'fast, мс':>10} {'x':>6}"
+                )
+                for size in sizes:
+                    slow = self._measure(self._serializer, size, repeat)
+                    fast = self._measure(self._fast, size, repeat)
+                    self.stdout.write(
+                        f"{size:>8} {slow * 1000:>16.1f} {fast * 1000:>10.1f} {slow / fast:>6.1f}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, count, subposts):
+        author = User.objects.create_user(username="benchmark-post-serializers")
+        posts = Post.objects.bulk_create(
+            [
+                Post(title=f"Post {i}", body="Текст " * 200, author=author)
+                for i in range(count)
+            ]
+        )
+        SubPost.objects.bulk_create(
+            [
+                SubPost(post=post, title=f"Часть {j}", body="Текст " * 50)
+                for post in posts
+                for j in range(subposts)
+            ]
+        )
+
+    def _request(self):
+        request = Request(APIRequestFactory().get("/api/posts/"))
+        request.user = AnonymousUser()
+        return request
+
+    def _queryset(self, request):
+        return like_counter.annotate(
+            Post.objects.with_viewer_state(request.user)
+        ).order_by("-created_at", "-id")
+
+    def _serializer(self, size):
+        request = self._request()
+        page = list(self._queryset(request).prefetch_related(ordered_subposts())[:size])
+        return PostSerializer(page, many=True, context={"request": request}).data
+
+    def _fast(self, size):
+        request = self._request()
+        fast = PostRowSerializer(request)
+        rows = fast.load(list(fast.prepare(self._queryset(request))[:size]))
+        return fast.render_many(rows)
+
+    def _measure(self, build, size, repeat):
+        # Лучшее из repeat прогонов, чтобы не мешали прогрев и фоновые задачи
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            build(size)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
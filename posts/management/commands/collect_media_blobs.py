@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.storage import BLOB_GRACE_PERIOD, collect_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы ContentAddressedStorage, на которые не ссылается ни "
+        "один пост дольше отсрочки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=int(BLOB_GRACE_PERIOD.total_seconds() // 60),
+            help="Не трогать блобы, менявшиеся за последние N минут",
+        )
+
+    def handle(self, *args, grace_minutes, **options):
+        storage = Post._meta.get_field("image").storage
+        deleted = collect_blobs(storage, grace=timedelta(minutes=grace_minutes))
+        self.stdout.write(self.style.SUCCESS(f"Удалено блобов: {deleted}"))
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    DATASETS,
+    EXPORT_FORMATS,
+    ExportFilterSerializer,
+    export_rows,
+    render_export,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая выгрузка постов, подпостов, комментариев или лайков в "
+        "NDJSON или CSV. Память не зависит от размера таблицы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("--output", choices=EXPORT_FORMATS, default="ndjson")
+        parser.add_argument("--gzip", action="store_true", help="Сжать gzip")
+        parser.add_argument(
+            "--file", default="-", help="Куда писать, по умолчанию stdout"
+        )
+        parser.add_argument("--author", type=int)
+        parser.add_argument("--created-after", help="ISO 8601, включительно")
+        parser.add_argument("--created-before", help="ISO 8601, не включительно")
+
+    def handle(self, *args, dataset, output, gzip, file, **options):
+        raw = {
+            name: options[name]
+            for name in ("author", "created_after", "created_before")
+            if options[name] is not None
+        }
+        filters = ExportFilterSerializer(data=raw)
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        chunks = render_export(
+            dataset, export_rows(dataset, **filters.validated_data), output, gzip
+        )
+        if file == "-":
+            target = sys.stdout.buffer
+        else:
+            target = open(file, "wb")
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+        finally:
+            if target is sys.stdout.buffer:
+                target.flush()
+            else:
+                target.close()
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.images import generate_variants
+from posts.models import Post
+
+
+def _generate(post_id, force):
+    try:
+        return generate_variants(post_id, force)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает уменьшенные копии изображений постов, у которых их нет "
+        "или они устарели. Изображения обрабатываются параллельно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Потоков обработки; 0 — в текущем потоке",
+        )
+        parser.add_argument("--chunk-size", type=int, default=100)
+        parser.add_argument(
+            "--force", action="store_true", help="Пересоздать и готовые варианты"
+        )
+
+    def handle(self, *args, workers, chunk_size, force, **options):
+        posts = (
+            Post.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("pk")
+            .values_list("pk", "image", "image_variants")
+        )
+        last_id, total, failed = 0, 0, 0
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            while True:
+                rows = list(posts.filter(pk__gt=last_id)[:chunk_size])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                ids = [
+                    pk
+                    for pk, image, variants in rows
+                    if force or (variants or {}).get("source") != image
+                ]
+                if workers:
+                    futures = [executor.submit(_generate, pk, force) for pk in ids]
+                    results = [future.result for future in futures]
+                else:
+                    results = [partial(generate_variants, pk, force) for pk in ids]
+                for pk, result in zip(ids, results):
+                    try:
+                        total += bool(result())
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f"Пост {pk}: {exc}")
+                self.stdout.write(f"Обработано {total} изображений (до id {last_id})")
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово: {total} изображений, ошибок: {failed}")
+        )
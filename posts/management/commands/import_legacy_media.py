@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import MediaBlob, Post
+from posts.storage import acquire
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит изображения постов, загруженные до ContentAddressedStorage, "
+        "в хранилище по содержимому. Одинаковые файлы сводятся в один блоб."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument(
+            "--keep-originals",
+            action="store_true",
+            help="Не удалять исходные файлы после переноса",
+        )
+
+    def handle(self, *args, chunk_size, keep_originals, **options):
+        storage = Post._meta.get_field("image").storage
+        posts = (
+            Post.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("pk")
+            .values_list("pk", "image", "image_variants")
+        )
+        last_id, moved, missing = 0, 0, 0
+        while True:
+            rows = list(posts.filter(pk__gt=last_id)[:chunk_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            managed = set(
+                MediaBlob.objects.filter(
+                    name__in=[image for _, image, _ in rows]
+                ).values_list("name", flat=True)
+            )
+            for pk, image, variants in rows:
+                if image in managed:
+                    continue
+                if not storage.exists(image):
+                    missing += 1
+                    self.stderr.write(f"Пост {pk}: нет файла {image}")
+                    continue
+                with storage.open(image, "rb") as original:
+                    name = storage.save(image, original)
+                with transaction.atomic():
+                    # Содержимое не менялось: готовые варианты остаются верными
+                    if variants.get("source") == image:
+                        variants = {**variants, "source": name}
+                    updated = Post.objects.filter(pk=pk, image=image).update(
+                        image=name, image_variants=variants
+                    )
+                    if updated:
+                        acquire(name)
+                if (
+                    updated
+                    and not keep_originals
+                    and not Post.objects.filter(image=image).exists()
+                ):
+                    storage.delete(image)
+                moved += updated
+            self.stdout.write(f"Перенесено {moved} файлов (до id {last_id})")
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово: {moved} файлов, не найдено: {missing}")
+        )
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import index_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает полнотекстовый индекс постов порциями по id. "
+        "Каждая порция — отдельная короткая транзакция, таблицы не блокируются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Пауза между порциями в секундах, чтобы не нагружать БД",
+        )
+        parser.add_argument(
+            "--start-id", type=int, default=0, help="Продолжить с этого id"
+        )
+
+    def handle(self, *args, chunk_size, sleep, start_id, **options):
+        last_id = start_id - 1
+        total = 0
+        while True:
+            ids = list(
+                Post.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            total += index_posts(ids)
+            last_id = ids[-1]
+            self.stdout.write(f"Проиндексировано {total} постов (до id {last_id})")
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Готово: {total} постов"))
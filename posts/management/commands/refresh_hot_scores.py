@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.ranking import refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает оценки ленты ?ordering=hot для всех постов порциями "
+        "по id. Нужна после развертывания и при смене весов или HOT_DECAY_SECONDS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Пауза между порциями в секундах, чтобы не нагружать БД",
+        )
+
+    def handle(self, *args, chunk_size, sleep, **options):
+        last_id, total = 0, 0
+        while True:
+            ids = list(
+                Post.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            total += refresh_scores(ids)
+            last_id = ids[-1]
+            self.stdout.write(f"Пересчитано {total} постов (до id {last_id})")
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"Готово: {total} постов"))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0007_alter_favorite_unique_together_remove_favorite_post_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="unique_views_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="PostViewSketch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(blank=True, null=True)),
+                ("registers", models.BinaryField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_sketches",
+                        to="posts.post",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="postviewsketch",
+            constraint=models.UniqueConstraint(
+                fields=("post", "day"), name="posts_viewsketch_post_day_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="postviewsketch",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("day__isnull", True)),
+                fields=("post",),
+                name="posts_viewsketch_post_total_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0008_post_unique_views"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LikeCounterShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("delta", models.IntegerField(default=0)),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="like_shards",
+                        to="posts.post",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="likecountershard",
+            constraint=models.UniqueConstraint(
+                fields=("post", "shard"), name="posts_likeshard_post_shard_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:11
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0010_post_posts_post_feed_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostSearchDocument",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="posts.post",
+                    ),
+                ),
+                (
+                    "document",
+                    django.contrib.postgres.search.SearchVectorField(null=True),
+                ),
+                ("indexed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["document"], name="posts_search_document_gin"
+                    )
+                ],
+            },
+        ),
+    ]
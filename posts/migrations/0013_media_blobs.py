@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:26
+
+from django.db import migrations, models
+import django.utils.timezone
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0012_post_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="post",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=posts.storage.ContentAddressedStorage(),
+                upload_to="posts/images/",
+                verbose_name="Изображение",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("sha256", models.CharField(max_length=64)),
+                ("size", models.BigIntegerField()),
+                ("refcount", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("refcount", 0)),
+                        fields=["updated_at"],
+                        name="posts_mediablob_orphans_idx",
+                    )
+                ],
+            },
+        ),
+    ]
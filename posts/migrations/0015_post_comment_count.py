@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0014_post_hot_score"),
+        ("interactions", "0003_comment_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE posts_post p
+            SET comment_count = c.total
+            FROM (
+                SELECT post_id, count(*) AS total
+                FROM interactions_comment
+                GROUP BY post_id
+            ) c
+            WHERE c.post_id = p.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
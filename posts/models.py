@@ -1,10 +1,33 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def with_viewer_state(self, user):
+        """Аннотирует liked_by_me / favorited_by_me для пользователя в том же запросе."""
+        if user is None or not user.is_authenticated:
+            return self.annotate(
+                liked_by_me=models.Value(False), favorited_by_me=models.Value(False)
+            )
+        from interactions.models import Favorite, Like
+
+        return self.annotate(
+            liked_by_me=models.Exists(
+                Like.objects.filter(post=models.OuterRef("pk"), user=user)
+            ),
+            favorited_by_me=models.Exists(
+                Favorite.objects.filter(post=models.OuterRef("pk"), user=user)
+            ),
+        )
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     body = models.TextField()
@@ -14,15 +37,47 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(
         upload_to='posts/images/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         verbose_name='Изображение'
     )
     like_count = models.PositiveIntegerField(default=0)
+    # Уменьшенные копии image, см. posts/images.py:
+    # {"source": имя исходника, "variants": {имя: {width, height, webp, jpeg}}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Оценка по HyperLogLog-скетчу за все время, см. PostViewSketch
+    unique_views_count = models.PositiveIntegerField(default=0)
+    # Число комментариев с ответами, см. interactions/counts.py
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset-пагинация ленты, см. blog/pagination.py
+            models.Index(fields=["-created_at", "-id"], name="posts_post_feed_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def current_views_count(self):
+        # Сохраненное значение плюс еще не сброшенные просмотры
+        from .counters import view_counter
+
+        return self.views_count + view_counter.pending(self.pk)
+
+    @property
+    def current_like_count(self):
+        # like_total добавляет like_counter.annotate(), иначе читаем шарды
+        if hasattr(self, "like_total"):
+            return self.like_total
+        from .counters import like_counter
+
+        return like_counter.value(self.pk)
+
 
 class SubPost(models.Model):
     title = models.CharField(max_length=100)
@@ -35,5 +90,114 @@ class SubPost(models.Model):
         return f"{self.title} (подпост для {self.post.title})"
 
 
+class LikeCounterShard(models.Model):
+    """
+    Шард счетчика лайков. Актуальное число лайков — Post.like_count плюс
+    сумма delta по шардам поста; шарды периодически сворачиваются в пост.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="like_shards")
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "shard"], name="posts_likeshard_post_shard_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}#{self.shard}: {self.delta:+d}"
+
+
+class PostViewSketch(models.Model):
+    """
+    HyperLogLog-скетч уникальных зрителей поста за день.
+    Строка с day=None хранит скетч за все время.
+    """
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="view_sketches"
+    )
+    day = models.DateField(null=True, blank=True)
+    registers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "day"], name="posts_viewsketch_post_day_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["post"],
+                condition=models.Q(day__isnull=True),
+                name="posts_viewsketch_post_total_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} ({self.day or 'всего'})"
+
+
+class PostSearchDocument(models.Model):
+    """
+    Полнотекстовый документ поста: заголовок, текст и подпосты.
+    Обновляется при записи поста или подпоста, см. posts/search.py.
+    """
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="search_document"
+    )
+    document = SearchVectorField(null=True)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=["document"], name="posts_search_document_gin")]
+
+    def __str__(self):
+        return f"Поисковый документ поста {self.post_id}"
+
+
+class MediaBlob(models.Model):
+    """
+    Файл в ContentAddressedStorage и число ссылающихся на него записей.
+    Блобы без ссылок удаляет команда collect_media_blobs.
+    """
 
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(refcount=0),
+                name="posts_mediablob_orphans_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+class PostScore(models.Model):
+    """Оценка поста для ленты ?ordering=hot, см. posts/ranking.py."""
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="hot"
+    )
+    score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Лента ?ordering=hot: ORDER BY score DESC, post_id DESC LIMIT n
+            models.Index(fields=["-score", "-post"], name="posts_postscore_hot_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id}: {self.score:.3f}"
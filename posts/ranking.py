@@ -0,0 +1,112 @@
+import logging
+import math
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .counters import FLUSH_BATCH_SIZE, flusher, like_counter, view_counter
+from .models import Post, PostScore
+
+logger = logging.getLogger(__name__)
+
+# Порядок ленты ?ordering=hot для keyset-пагинации
+HOT_ORDERING = ("-hot_score", "-id")
+# Вклад взаимодействий в активность поста
+LIKE_WEIGHT = 3.0
+COMMENT_WEIGHT = 2.0
+VIEW_WEIGHT = 0.1
+# Точка отсчета новизны; сдвиг не меняет порядок ленты
+HOT_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def hot_decay_seconds():
+    """Сколько секунд новизны стоят десятикратной активности."""
+    return getattr(settings, "HOT_DECAY_SECONDS", 45000)
+
+
+def hot_score(likes, comments, views, created_at):
+    """
+    log10(активности) плюс время публикации в единицах hot_decay_seconds().
+    Затухание заложено в саму формулу: новые посты получают больший вклад
+    времени, поэтому старые оценки не нужно периодически пересчитывать.
+    """
+    activity = LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments + VIEW_WEIGHT * views
+    age = (created_at - HOT_EPOCH).total_seconds()
+    return math.log10(max(activity, 1)) + age / hot_decay_seconds()
+
+
+def refresh_scores(post_ids):
+    """Пересчитывает оценки постов одним SELECT и одним INSERT ... ON CONFLICT."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    rows = like_counter.annotate(Post.objects.filter(pk__in=post_ids)).values_list(
+        "pk", "like_total", "comment_count", "views_count", "created_at"
+    )
+    scores = [
+        PostScore(post_id=pk, score=hot_score(likes, comments, views, created_at))
+        for pk, likes, comments, views, created_at in rows
+    ]
+    PostScore.objects.bulk_create(
+        scores,
+        update_conflicts=True,
+        unique_fields=["post"],
+        update_fields=["score", "updated_at"],
+    )
+    return len(scores)
+
+
+class HotScores:
+    """
+    Посты, активность которых этот процесс менял, копятся в памяти и
+    пересчитываются пачкой при каждом сбросе счетчиков. Просмотры попадают
+    сюда после записи в БД, поэтому оценка видит уже сброшенные значения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = set()
+        view_counter.subscribe(self.mark)
+        flusher.register(self.refresh)
+
+    def mark(self, *post_ids):
+        with self._lock:
+            self._dirty.update(post_ids)
+        flusher.start()
+
+    def mark_on_commit(self, *post_ids):
+        # До фиксации фоновый поток не увидит новых строк
+        transaction.on_commit(lambda: self.mark(*post_ids))
+
+    def refresh(self):
+        with self._lock:
+            post_ids, self._dirty = sorted(self._dirty), set()
+        refreshed = 0
+        try:
+            for start in range(0, len(post_ids), FLUSH_BATCH_SIZE):
+                refreshed += refresh_scores(post_ids[start : start + FLUSH_BATCH_SIZE])
+        except Exception:
+            logger.exception("Failed to refresh hot scores")
+            with self._lock:
+                self._dirty.update(post_ids)
+        return refreshed
+
+
+hot_scores = HotScores()
+
+
+def wants_hot(request):
+    params = getattr(request, "query_params", request.GET)
+    return params.get("ordering") == "hot"
+
+
+def with_hot_score(queryset):
+    """Посты с оценкой в порядке HOT_ORDERING; ведущим идет индекс PostScore."""
+    return (
+        queryset.filter(hot__isnull=False)
+        .annotate(hot_score=F("hot__score"))
+        .order_by(*HOT_ORDERING)
+    )
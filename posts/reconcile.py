@@ -0,0 +1,91 @@
+from django.utils import timezone
+from rest_framework import serializers
+
+from .fragments import invalidate_on_commit
+from .models import SubPost
+from .search import index_on_commit
+from .serializers import SubPostSerializer
+
+# Поля подпоста, которые можно менять через пост
+SUBPOST_FIELDS = ("title", "body")
+
+
+def validate_subposts(items):
+    """
+    Проверяет сырые данные подпостов из запроса без обращений к БД.
+    Возвращает словари с id (или None) и переданными полями.
+    """
+    if not isinstance(items, list):
+        raise serializers.ValidationError({"subposts": ["Expected a list of items."]})
+    validated, errors = [], {}
+    for i, item in enumerate(items):
+        serializer = SubPostSerializer(data=item, partial=True)
+        if not serializer.is_valid():
+            errors[i] = serializer.errors
+            continue
+        pk = item.get("id")
+        if pk in (None, ""):
+            pk = None
+        else:
+            try:
+                pk = int(pk)
+            except (TypeError, ValueError):
+                errors[i] = {"id": ["A valid integer is required."]}
+                continue
+        validated.append({"id": pk, **serializer.validated_data})
+    if errors:
+        raise serializers.ValidationError({"subposts": errors})
+    return validated
+
+
+def reconcile_subposts(post, items):
+    """
+    Приводит подпосты поста к items одним SELECT и не более чем тремя
+    пакетными запросами: INSERT новых, UPDATE измененных, DELETE пропавших.
+
+    Элемент с id обновляет подпост этого поста (чужие id игнорируются),
+    элемент без id и с title и body создает новый. Подпосты, которых нет
+    среди переданных id, удаляются. Неизмененные строки не трогаются:
+    их updated_at не меняется и кэш поста из-за них не сбрасывается.
+    """
+    existing = {sp.pk: sp for sp in SubPost.objects.filter(post=post)}
+    sent = set()
+    to_create, to_update = [], []
+    now = timezone.now()
+
+    for item in items:
+        pk = item.get("id")
+        if pk is None:
+            if all(field in item for field in SUBPOST_FIELDS):
+                to_create.append(
+                    SubPost(post=post, **{f: item[f] for f in SUBPOST_FIELDS})
+                )
+            continue
+        sent.add(pk)
+        subpost = existing.get(pk)
+        if subpost is None:
+            continue
+        changed = False
+        for field in SUBPOST_FIELDS:
+            if field in item and getattr(subpost, field) != item[field]:
+                setattr(subpost, field, item[field])
+                changed = True
+        if changed:
+            # bulk_update не вызывает auto_now
+            subpost.updated_at = now
+            to_update.append(subpost)
+
+    to_delete = [pk for pk in existing if pk not in sent]
+
+    if to_create:
+        SubPost.objects.bulk_create(to_create)
+    if to_update:
+        SubPost.objects.bulk_update(to_update, [*SUBPOST_FIELDS, "updated_at"])
+    if to_delete:
+        SubPost.objects.filter(pk__in=to_delete).delete()
+
+    if to_create or to_update or to_delete:
+        # bulk_create и bulk_update не шлют сигналы, сбрасываем кэш и индекс сами
+        invalidate_on_commit(post.pk)
+        index_on_commit(post.pk)
+    return len(to_create), len(to_update), len(to_delete)
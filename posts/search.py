@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, PostSearchDocument, SubPost
+
+# Порядок выдачи результатов для keyset-пагинации
+SEARCH_ORDERING = ("-rank", "-id")
+# Маркеры совпадений в ts_headline, заменяются на <mark> после экранирования
+_START, _STOP = "\ue000", "\ue001"
+
+
+def search_config():
+    return getattr(settings, "SEARCH_CONFIG", "russian")
+
+
+def _subposts_text():
+    texts = (
+        SubPost.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(
+            text=StringAgg(
+                Concat("title", Value(" "), "body", output_field=models.TextField()),
+                delimiter=" ",
+                ordering="pk",
+            )
+        )
+        .values("text")
+    )
+    return Coalesce(Subquery(texts), Value(""), output_field=models.TextField())
+
+
+def document_vector():
+    """Вектор поста: заголовок (вес A), текст (B) и подпосты (C)."""
+    config = search_config()
+    return (
+        SearchVector("title", weight="A", config=config)
+        + SearchVector("body", weight="B", config=config)
+        + SearchVector(_subposts_text(), weight="C", config=config)
+    )
+
+
+def index_posts(post_ids):
+    """Пересчитывает документы постов: один INSERT и один UPDATE на вызов."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    with transaction.atomic():
+        existing = Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True)
+        PostSearchDocument.objects.bulk_create(
+            [PostSearchDocument(post_id=pk) for pk in existing],
+            ignore_conflicts=True,
+        )
+        vectors = (
+            Post.objects.filter(pk=OuterRef("post_id"))
+            .annotate(document=document_vector())
+            .values("document")
+        )
+        return PostSearchDocument.objects.filter(post_id__in=post_ids).update(
+            document=Subquery(vectors), indexed_at=timezone.now()
+        )
+
+
+def index_on_commit(post_id):
+    # robust: ошибка индексации не должна ломать уже зафиксированную запись
+    transaction.on_commit(lambda: index_posts([post_id]), robust=True)
+
+
+def search_query(text):
+    return SearchQuery(text, config=search_config(), search_type="websearch")
+
+
+def search_posts(queryset, text):
+    """Фильтрует посты по запросу и аннотирует rank для SEARCH_ORDERING."""
+    query = search_query(text)
+    rank = SearchRank(F("search_document__document"), query)
+    return queryset.filter(search_document__document=query).annotate(
+        rank=Cast(rank, models.FloatField())
+    )
+
+
+def attach_headlines(posts, text):
+    """
+    Добавляет постам страницы headline — фрагменты с подсвеченными
+    совпадениями. Отдельный запрос только по id страницы: ts_headline дорогой.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    source = Concat(
+        "body", Value(" "), _subposts_text(), output_field=models.TextField()
+    )
+    headlines = dict(
+        Post.objects.filter(pk__in=[post.pk for post in posts])
+        .annotate(
+            headline=SearchHeadline(
+                source,
+                search_query(text),
+                config=search_config(),
+                start_sel=_START,
+                stop_sel=_STOP,
+                max_words=35,
+                min_words=15,
+                max_fragments=2,
+            )
+        )
+        .values_list("pk", "headline")
+    )
+    for post in posts:
+        post.headline = highlight(headlines.get(post.pk, ""))
+    return posts
+
+
+def highlight(headline):
+    text = escape(headline).replace(_START, "<mark>").replace(_STOP, "</mark>")
+    return mark_safe(text)
@@ -1,11 +1,15 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from blog.fieldsets import SparseFieldsetsMixin
+from .images import variant_urls
 from .models import Post, SubPost
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-class SubPostSerializer(serializers.ModelSerializer):
+class SubPostSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     post = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -14,9 +18,14 @@ class SubPostSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at", "updated_at", "post"]
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     subposts = SubPostSerializer(many=True, required=False)
+    views_count = serializers.IntegerField(source="current_views_count", read_only=True)
+    like_count = serializers.IntegerField(source="current_like_count", read_only=True)
+    liked_by_me = serializers.BooleanField(read_only=True, default=False)
+    favorited_by_me = serializers.BooleanField(read_only=True, default=False)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -25,9 +34,14 @@ class PostSerializer(serializers.ModelSerializer):
             "title",
             "body",
             "image",
+            "image_variants",
             "author",
             "views_count",
+            "unique_views_count",
             "like_count",
+            "liked_by_me",
+            "favorited_by_me",
+            "comment_count",
             "created_at",
             "updated_at",
             "subposts",
@@ -37,9 +51,16 @@ class PostSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "views_count",
+            "unique_views_count",
             "like_count",
+            "comment_count",
         ]
 
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_image_variants(self, obj):
+        # Уменьшенные копии image и srcset, None пока они не готовы
+        return variant_urls(obj.image_variants, self.context.get("request"))
+
     def create(self, validated_data):
         validated_data["author"] = self.context["request"].user
         subposts_data = validated_data.pop("subposts", [])
@@ -65,21 +86,39 @@ class PostSerializer(serializers.ModelSerializer):
         return instance
 
     def _update_subposts(self, post, subposts_data):
-        current_ids = set(post.subposts.values_list("id", flat=True))
-        updated_ids = set()
+        from .reconcile import reconcile_subposts
 
-        for subpost_data in subposts_data:
-            subpost_id = subpost_data.get("id")
-            if subpost_id and subpost_id in current_ids:
-                subpost = SubPost.objects.get(id=subpost_id)
-                for key, value in subpost_data.items():
-                    if key != "id":
-                        setattr(subpost, key, value)
-                subpost.save()
-                updated_ids.add(subpost_id)
-            else:
-                SubPost.objects.create(post=post, **subpost_data)
-
-        ids_to_delete = current_ids - updated_ids
-        if ids_to_delete:
-            SubPost.objects.filter(id__in=ids_to_delete).delete()
+        # id подпостов только для чтения и в validated_data не попадает
+        raw = self.initial_data.get("subposts") or []
+        items = []
+        for i, subpost_data in enumerate(subposts_data):
+            source = raw[i] if i < len(raw) and isinstance(raw[i], dict) else {}
+            try:
+                pk = int(source["id"]) if source.get("id") else None
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(
+                    {"subposts": {i: {"id": ["A valid integer is required."]}}}
+                )
+            items.append({"id": pk, **subpost_data})
+        reconcile_subposts(post, items)
+
+
+class PostSearchSerializer(PostSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True, default="")
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ["rank", "headline"]
+
+
+class SubPostIngestSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=100)
+    body = serializers.CharField()
+
+
+class PostIngestSerializer(serializers.Serializer):
+    """Валидация массового импорта без обращений к БД, см. posts/ingest.py."""
+
+    title = serializers.CharField(max_length=200)
+    body = serializers.CharField()
+    subposts = SubPostIngestSerializer(many=True, required=False)
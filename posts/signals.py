@@ -0,0 +1,106 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from interactions.counts import comment_added, comment_removed
+from interactions.models import Comment, Like
+
+from .fragments import invalidate_on_commit
+from .images import needs_variants, schedule_variants
+from .live import live_counters
+from .models import Post, SubPost
+from .ranking import hot_scores
+from .search import index_on_commit
+from .storage import acquire, release
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    invalidate_on_commit(instance.pk)
+
+
+# Подпосты и комментарии входят в закэшированные фрагменты своего поста
+@receiver(post_save, sender=SubPost)
+@receiver(post_delete, sender=SubPost)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_parent_fragments(sender, instance, **kwargs):
+    invalidate_on_commit(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=SubPost)
+@receiver(post_delete, sender=SubPost)
+def reindex_post(sender, instance, **kwargs):
+    index_on_commit(instance.pk if sender is Post else instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "image" not in update_fields:
+        return
+    # Отложенное поле не сохранялось, а чтение вызвало бы лишний запрос
+    if instance.get_deferred_fields() & {"image", "image_variants"}:
+        return
+    if needs_variants(instance):
+        schedule_variants(instance.pk)
+
+
+def _tracks_image(instance, update_fields=None):
+    if update_fields is not None and "image" not in update_fields:
+        return False
+    return "image" not in instance.get_deferred_fields()
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_image(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or not _tracks_image(instance, update_fields):
+        return
+    instance._previous_image = (
+        Post.objects.filter(pk=instance.pk).values_list("image", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, update_fields=None, **kwargs):
+    if not _tracks_image(instance, update_fields):
+        return
+    previous = instance.__dict__.pop("_previous_image", None) or ""
+    current = instance.image.name or ""
+    if previous != current:
+        acquire(current)
+        release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if "image" not in instance.get_deferred_fields():
+        release(instance.image.name)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def rescore_post(sender, instance, **kwargs):
+    hot_scores.mark_on_commit(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def score_new_post(sender, instance, created, **kwargs):
+    if created:
+        hot_scores.mark_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    # Comment.save() выполняет INSERT в транзакции, счетчики меняются в ней же
+    if created:
+        comment_added(instance)
+        live_counters.add_on_commit(instance.post_id, "comments", 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, origin=None, **kwargs):
+    if comment_removed(instance, origin):
+        live_counters.add_on_commit(instance.post_id, "comments", -1)
@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+# 2**12 регистров по байту: скетч занимает 4 КБ, ошибка оценки около 1.6%
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    """
+    Вероятностный скетч для оценки числа уникальных элементов.
+    Размер не зависит от числа добавленных элементов, скетчи
+    объединяются поэлементным максимумом регистров.
+    """
+
+    def __init__(self, registers=None, precision=DEFAULT_PRECISION):
+        if registers is not None:
+            precision = len(registers).bit_length() - 1
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            self.registers = bytearray(registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        x = int.from_bytes(digest, "big")
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.size != self.size:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        # Для малых значений точнее линейный подсчет по пустым регистрам
+        if estimate <= 2.5 * m:
+            zeros = self.registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def copy(self):
+        return HyperLogLog(self.registers)
+
+    def __bytes__(self):
+        return bytes(self.registers)
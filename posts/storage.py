@@ -0,0 +1,133 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# Каталог временных файлов загрузки внутри MEDIA_ROOT: os.replace из него
+# в итоговый путь атомарен, так как это та же файловая система
+UPLOAD_TMP_DIR = ".uploads"
+# Блоб без ссылок удаляется не сразу: его могли только что загрузить,
+# а пост со ссылкой на него еще не сохранен
+BLOB_GRACE_PERIOD = timedelta(hours=1)
+
+
+def blob_name(prefix, digest, original):
+    """prefix/ab/cd/<sha256>.ext: два уровня по 256 каталогов."""
+    ext = os.path.splitext(original)[1].lower()
+    return posixpath.join(prefix, digest[:2], digest[2:4], digest + ext)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, где имя файла — SHA-256 содержимого. Файл хэшируется по
+    мере записи на диск порциями content.chunks() и не читается в память
+    целиком. Одинаковое содержимое хранится один раз, ссылки на него
+    считает MediaBlob.refcount.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяет содержимое, см. _save(); переименовывать нечего
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(UPLOAD_TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            digest = digest.hexdigest()
+            name = blob_name(posixpath.dirname(name), digest, name)
+            while not self._place(name, tmp_path, digest, size):
+                pass
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+    def _place(self, name, tmp_path, digest, size):
+        """
+        Кладет файл на место под блокировкой строки MediaBlob: collect_blobs()
+        не удалит файл между проверкой его наличия и продлением отсрочки.
+        False, если сборщик удалил строку, пока мы ждали блокировку.
+        """
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            MediaBlob.objects.bulk_create(
+                [MediaBlob(name=name, sha256=digest, size=size)], ignore_conflicts=True
+            )
+            # UPDATE держит блокировку строки до конца транзакции;
+            # updated_at продлевает отсрочку сборки мусора, см. BLOB_GRACE_PERIOD
+            if not MediaBlob.objects.filter(name=name).update(
+                updated_at=timezone.now()
+            ):
+                return False
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(tmp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        return True
+
+
+def acquire(name):
+    """Ссылка на блоб появилась. Файлы вне хранилища не учитываются."""
+    from .models import MediaBlob
+
+    if name:
+        MediaBlob.objects.filter(name=name).update(
+            refcount=F("refcount") + 1, updated_at=timezone.now()
+        )
+
+
+def release(name):
+    """Ссылка на блоб пропала; файл удалит collect_blobs()."""
+    from .models import MediaBlob
+
+    if name:
+        MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+            refcount=F("refcount") - 1, updated_at=timezone.now()
+        )
+
+
+def collect_blobs(storage, grace=BLOB_GRACE_PERIOD, batch_size=500):
+    """Удаляет блобы без ссылок, не менявшиеся дольше grace. Возвращает их число."""
+    from .models import MediaBlob
+
+    deleted = 0
+    cutoff = timezone.now() - grace
+    while True:
+        with transaction.atomic():
+            # skip_locked: параллельные acquire() и другие сборщики не ждут
+            blobs = list(
+                MediaBlob.objects.select_for_update(skip_locked=True)
+                .filter(refcount=0, updated_at__lt=cutoff)
+                .order_by("pk")[:batch_size]
+            )
+            if not blobs:
+                return deleted
+            for blob in blobs:
+                storage.delete(blob.name)
+            MediaBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+            deleted += len(blobs)
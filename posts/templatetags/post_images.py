@@ -0,0 +1,24 @@
+from django import template
+
+from posts.images import IMAGE_VARIANTS, variant_urls
+
+register = template.Library()
+
+
+@register.inclusion_tag("posts/picture.html")
+def post_picture(post, variant="card", sizes="100vw", lazy=True):
+    """
+    <picture> с WebP и JPEG вариантами изображения поста. Пока варианты
+    не готовы, отдается исходный файл.
+    """
+    context = {"alt": post.title, "sizes": sizes, "lazy": lazy, "original": None}
+    urls = variant_urls(post.image_variants)
+    if urls is None:
+        context["original"] = post.image.url
+        return context
+    # Запрошенный вариант или ближайший больший, если такого не создали
+    names = list(IMAGE_VARIANTS)
+    candidates = names[: names.index(variant) + 1][::-1]
+    fallback = next(urls[name] for name in candidates + names if name in urls)
+    context.update(srcset=urls["srcset"], fallback=fallback)
+    return context
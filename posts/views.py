@@ -3,12 +3,20 @@ from django.urls import reverse
 from rest_framework import viewsets, status, serializers
 from .models import Post, SubPost
 from interactions.models import Like
-from .serializers import PostSerializer, SubPostSerializer
+from .serializers import PostSearchSerializer, PostSerializer, SubPostSerializer
+from .counters import like_counter, unique_viewers, view_counter, viewer_key
+from .fragments import attach_versions, fragment_timeout
+from .conditional import (
+    latest, make_etag, not_modified, post_state, prefetched_subposts, row_state,
+    set_validators, with_versions,
+)
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db import transaction, models
-from drf_spectacular.utils import extend_schema, OpenApiResponse
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.db import IntegrityError, transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.views import APIView
 from django.contrib.auth.models import AnonymousUser
 from django.views.generic import ListView, DetailView, UpdateView
 from .forms import PostForm, SubPostFormSet
@@ -17,23 +25,53 @@ from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
-from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
+from blog.fieldsets import Fieldset
+from blog.pagination import DEFAULT_ORDERING, KeysetPagination, KeysetPaginationMixin
+from .search import SEARCH_ORDERING, attach_headlines, search_posts
+from .ingest import import_ndjson, ingest_chunks
+from .reconcile import reconcile_subposts, validate_subposts
+from .fastpath import PostRowSerializer, fast_read_enabled, ordered_subposts
+from .ranking import HOT_ORDERING, wants_hot, with_hot_score
+from .export import (
+    DATASETS, EXPORT_FORMATS, ExportFilterSerializer, export_content_type,
+    export_filename, export_rows, render_export,
+)
+import gzip
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Ограничение на число id в запросе состояния лайков
+LIKED_STATE_MAX_IDS = 200
+# Тяжелые поля поста, которые не читаются из БД, если их нет в ?fields=
+POST_DEFERRABLE_FIELDS = ("title", "body", "image", "image_variants")
 
-class PostListView(ListView):
+
+class PostListView(KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'posts/post_list.html'
     context_object_name = 'posts'
     ordering = ['-created_at']
     paginate_by = 10
 
+    @property
+    def keyset_ordering(self):
+        return HOT_ORDERING if wants_hot(self.request) else DEFAULT_ORDERING
+
     def get_queryset(self):
-        return Post.objects.all().select_related('author').order_by('-created_at')
+        posts = Post.objects.with_viewer_state(self.request.user).select_related('author')
+        posts = like_counter.annotate(posts)
+        if wants_hot(self.request):
+            return with_hot_score(posts)
+        return posts.order_by('-created_at')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['posts'] = attach_versions(context['posts'])
+        context['fragment_timeout'] = fragment_timeout()
+        context['hot'] = wants_hot(self.request)
+        return context
 
 
 class PostDetailView(DetailView):
@@ -42,28 +80,62 @@ class PostDetailView(DetailView):
     context_object_name = 'post'
 
     def get_queryset(self):
-        return Post.objects.prefetch_related('subposts', 'likes')
+        posts = with_versions(Post.objects.with_viewer_state(self.request.user), comments=True)
+        # Подпосты читаются только при промахе кэша фрагмента
+        return like_counter.annotate(posts).select_related('author')
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
         post = self.object
+        # Просмотры не входят в ETag: каждый запрос сам их увеличивает
+        etag = make_etag(
+            request.user.pk, post.pk, post.updated_at, post.current_like_count,
+            post.liked_by_me, post.subposts_updated, post.subposts_count,
+            post.comments_updated, post.comment_count,
+        )
+        modified = latest(post.updated_at, post.subposts_updated, post.comments_updated)
+        response = not_modified(request, etag, modified)
+        if response is None:
+            response = self.render_to_response(self.get_context_data(object=post))
+        return set_validators(response, etag, modified)
 
-        if self.request.user.is_authenticated:
-            context['user_liked'] = post.likes.filter(user=self.request.user).exists()
-        else:
-            context['user_liked'] = False
-
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['user_liked'] = self.object.liked_by_me
+        context['comments'] = self.object.comments.select_related('author')
+        attach_versions([self.object])
+        context['fragment_timeout'] = fragment_timeout()
         return context
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset=queryset)
-        obj.views_count = F('views_count') + 1
-        obj.save(update_fields=['views_count'])
-        obj.refresh_from_db()
+        # Просмотр копится в буфере, в БД уходит пачкой по таймеру
+        obj.views_count += view_counter.increment(obj.pk)
+        unique_viewers.add(obj.pk, viewer_key(self.request))
         return obj
 
 
 
+class PostSearchView(KeysetPaginationMixin, ListView):
+    model = Post
+    template_name = 'posts/search.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+    keyset_ordering = SEARCH_ORDERING
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return Post.objects.none()
+        return search_posts(Post.objects.select_related('author'), self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['posts'] = attach_headlines(context['posts'], self.query)
+        return context
+
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     form_class = PostForm
@@ -135,8 +207,96 @@ class PostViewSet(viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @property
+    def keyset_ordering(self):
+        # ?ordering=hot: лента по PostScore, см. posts/ranking.py
+        return HOT_ORDERING if wants_hot(self.request) else DEFAULT_ORDERING
+
     def get_queryset(self):
-        return Post.objects.prefetch_related("subposts").order_by("-created_at")
+        # Читаем и аннотируем только то, что попадет в ответ (?fields=, ?omit=)
+        fieldset = Fieldset.from_request(self.request)
+        posts = Post.objects.defer(*fieldset.deferred(POST_DEFERRABLE_FIELDS))
+        if fieldset.wants("liked_by_me") or fieldset.wants("favorited_by_me"):
+            posts = posts.with_viewer_state(self.request.user)
+        if fieldset.wants("like_count"):
+            posts = like_counter.annotate(posts)
+        if fieldset.wants("subposts"):
+            posts = posts.prefetch_related(ordered_subposts())
+        if wants_hot(self.request):
+            return with_hot_score(posts)
+        return posts.order_by("-created_at")
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ordering",
+                str,
+                enum=["hot"],
+                description="hot — популярные: лайки, комментарии, просмотры и новизна",
+            )
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        if fast_read_enabled():
+            return self.fast_list(request)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        # Ссылки и count страницы без сериализации постов
+        meta = self.get_paginated_response([]).data
+        etag = make_etag(
+            request.get_full_path(), request.user.pk, meta, [post_state(p) for p in page]
+        )
+        modified = latest(
+            *(p.updated_at for p in page),
+            *(sp.updated_at for p in page for sp in prefetched_subposts(p)),
+        )
+        response = not_modified(request, etag, modified)
+        if response is None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        return set_validators(response, etag, modified)
+
+    def fast_list(self, request):
+        # Строки values() вместо моделей и PostSerializer, см. posts/fastpath.py
+        fast = PostRowSerializer(request)
+        queryset = fast.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(fast.render_many(fast.load(list(queryset))))
+        fast.load(page)
+        meta = self.get_paginated_response([]).data
+        etag = make_etag(request.get_full_path(), request.user.pk, meta, fast.state(page))
+        modified = latest(*fast.modified(page))
+        response = not_modified(request, etag, modified)
+        if response is None:
+            response = self.get_paginated_response(fast.render_many(page))
+        return set_validators(response, etag, modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        posts = with_versions(Post.objects.with_viewer_state(request.user))
+        try:
+            row = like_counter.annotate(posts).filter(pk=kwargs["pk"]).values(
+                "pk", "updated_at", "views_count", "unique_views_count", "like_total",
+                "liked_by_me", "favorited_by_me", "subposts_updated", "subposts_count",
+            ).first()
+        except ValueError:
+            row = None
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = make_etag(request.get_full_path(), request.user.pk, row_state(row))
+        modified = latest(row["updated_at"], row["subposts_updated"])
+        response = not_modified(request, etag, modified)
+        if response is None and fast_read_enabled():
+            fast = PostRowSerializer(request)
+            queryset = fast.prepare(self.filter_queryset(self.get_queryset()))
+            rows = fast.load(list(queryset.filter(pk=row["pk"])))
+            if rows:
+                response = Response(fast.render(rows[0]))
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, modified)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -166,25 +326,29 @@ class PostViewSet(viewsets.ModelViewSet):
 
         try:
             with transaction.atomic():
-                like, created = Like.objects.get_or_create(user=request.user, post=post)
-                like_count = Like.objects.filter(post=post).count()
-
-                if not created:
-                    like.delete()
-                    like_count = Like.objects.filter(post=post).count()
-                    post.like_count = like_count
-                    post.save(update_fields=["like_count"])
-                    return Response({
-                        "status": "unliked",
-                        "like_count": like_count
-                    }, status=status.HTTP_200_OK)
+                deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+                if deleted:
+                    like_counter.add(post.pk, -1)
                 else:
-                    post.like_count = like_count
-                    post.save(update_fields=["like_count"])
-                    return Response({
-                        "status": "liked",
-                        "like_count": like_count
-                    }, status=status.HTTP_201_CREATED)
+                    try:
+                        with transaction.atomic():
+                            Like.objects.create(user=request.user, post=post)
+                    except IntegrityError:
+                        # Лайк уже поставлен параллельным запросом
+                        pass
+                    else:
+                        like_counter.add(post.pk, 1)
+
+            like_count = like_counter.value(post.pk)
+            if deleted:
+                return Response({
+                    "status": "unliked",
+                    "like_count": like_count
+                }, status=status.HTTP_200_OK)
+            return Response({
+                "status": "liked",
+                "like_count": like_count
+            }, status=status.HTTP_201_CREATED)
         except Exception as e:
             logger.error(f"Error in like action: {str(e)}")
             return Response(
@@ -192,6 +356,63 @@ class PostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @extend_schema(
+        methods=["GET"],
+        description="Какие из постов ?ids=1,2,3 лайкнул и добавил в избранное текущий пользователь",
+        responses={200: OpenApiResponse(description="Списки id постов")},
+    )
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def liked(self, request):
+        try:
+            ids = [int(pk) for pk in request.query_params.get("ids", "").split(",") if pk]
+        except ValueError:
+            return Response(
+                {"error": "ids must be a comma-separated list of integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(ids) > LIKED_STATE_MAX_IDS:
+            return Response(
+                {"error": f"No more than {LIKED_STATE_MAX_IDS} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        state = (
+            Post.objects.filter(pk__in=ids)
+            .with_viewer_state(request.user)
+            .values_list("pk", "liked_by_me", "favorited_by_me")
+        )
+        liked, favorited = [], []
+        for pk, is_liked, is_favorited in state:
+            if is_liked:
+                liked.append(pk)
+            if is_favorited:
+                favorited.append(pk)
+        return Response({"liked": sorted(liked), "favorited": sorted(favorited)})
+
+    @extend_schema(
+        methods=["GET"],
+        description="Полнотекстовый поиск по постам и подпостам: ?q=запрос",
+        responses={200: PostSearchSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return Response(
+                {"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # Курсор по (rank, id): порядок релевантности стабилен между страницами
+        paginator = KeysetPagination()
+        paginator.ordering = SEARCH_ORDERING
+        page = paginator.paginate_queryset(
+            search_posts(self.get_queryset(), text), request, view=self
+        )
+        page = attach_headlines(page, text)
+        serializer = PostSearchSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @extend_schema(
         methods=["GET"],
         description="Увеличить счетчик просмотров",
@@ -202,68 +423,73 @@ class PostViewSet(viewsets.ModelViewSet):
 
     def view(self, request, pk=None):
         try:
-            with transaction.atomic():
-                post = Post.objects.select_for_update().get(pk=pk)
-                post.views_count = models.F("views_count") + 1
-                post.save()
-                post.refresh_from_db()
-                return Response({"views_count": post.views_count})
+            post = Post.objects.only("id", "views_count").get(pk=pk)
+            pending = view_counter.increment(post.pk)
+            unique_viewers.add(post.pk, viewer_key(request))
+            return Response({"views_count": post.views_count + pending})
         except Post.DoesNotExist:
             return Response(
                 {"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
+    @extend_schema(
+        methods=["POST"],
+        description=(
+            "Потоковый импорт постов: NDJSON, по объекту поста на строку, "
+            "можно сжать gzip (Content-Encoding: gzip). В ответе NDJSON "
+            "с ходом импорта после каждой порции и ошибками по номерам строк"
+        ),
+        request={"application/x-ndjson": OpenApiTypes.BINARY},
+        responses={200: OpenApiResponse(description="NDJSON с ходом импорта")},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAuthenticated],
+    )
+    def import_posts(self, request):
+        # Тело читается построчно по мере поступления, request.data не трогаем
+        stream = request.stream
+        if stream is None:
+            return Response(
+                {"error": "Request body is empty"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.META.get("HTTP_CONTENT_ENCODING", "").lower() == "gzip":
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
+        return StreamingHttpResponse(
+            import_ndjson(stream, request.user), content_type="application/x-ndjson"
+        )
+
     def create(self, request, *args, **kwargs):
         if isinstance(request.data, list):
             return self.bulk_create(request, *args, **kwargs)
         return super().create(request, *args, **kwargs)
 
     def bulk_create(self, request, *args, **kwargs):
+        """
+        Создание постов из JSON-массива. Порциями идет только работа с БД:
+        сам массив DRF разбирает целиком и держит в памяти до конца запроса.
+        Большие объемы — через потоковый импорт POST /api/posts/import/ (NDJSON).
+        """
         if isinstance(request.user, AnonymousUser):
             return Response(
                 {"detail": "Authentication credentials were not provided."},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        data = [{**item} for item in request.data]
-
-        serializer = self.get_serializer(data=data, many=True)
-        serializer.is_valid(raise_exception=True)
-
-        self.perform_bulk_create(serializer, request.user)
-
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            serializer.data, status=status.HTTP_201_CREATED, headers=headers
-        )
-
-    def perform_bulk_create(self, serializer, user):
+        # Все или ничего: при первой невалидной порции откатываем импорт
+        ids = []
         with transaction.atomic():
-            posts = []
-            for item in serializer.validated_data:
-                # Проверка обязательных полей
-                if 'title' not in item or 'body' not in item:
-                    continue
-
-                post = Post(
-                    title=item["title"],
-                    body=item["body"],
-                    author=user,
-                )
-                posts.append(post)
-
-            created_posts = Post.objects.bulk_create(posts)
-
-            for post, item in zip(created_posts, serializer.validated_data):
-                subposts_data = item.get("subposts", [])
-                for subpost_data in subposts_data:
-                    # Проверка полей подпоста
-                    if 'title' in subpost_data and 'body' in subpost_data:
-                        SubPost.objects.create(
-                            title=subpost_data["title"],
-                            body=subpost_data["body"],
-                            post=post,
-                        )
+            for result in ingest_chunks(enumerate(request.data), request.user):
+                if result.errors:
+                    transaction.set_rollback(True)
+                    return Response(
+                        [{"index": i, "errors": e} for i, e in result.errors],
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                ids.extend(result.ids)
+        return Response([{"id": pk} for pk in ids], status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         with transaction.atomic():
@@ -276,33 +502,9 @@ class PostViewSet(viewsets.ModelViewSet):
             self.perform_update(serializer)
 
             if subposts_data:
-                existing_ids = [sp.id for sp in instance.subposts.all()]
-                sent_ids = []
-
-                for sp_data in subposts_data:
-                    sp_id = sp_data.get("id")
-                    if sp_id:
-                        sent_ids.append(sp_id)
-                        sp_instance = SubPost.objects.filter(
-                            id=sp_id, post=instance
-                        ).first()
-                        if sp_instance:
-                            sp_serializer = SubPostSerializer(
-                                sp_instance, data=sp_data, partial=True
-                            )
-                            sp_serializer.is_valid(raise_exception=True)
-                            sp_serializer.save()
-                    else:
-                        if 'title' in sp_data and 'body' in sp_data:
-                            SubPost.objects.create(
-                                post=instance,
-                                title=sp_data["title"],
-                                body=sp_data["body"],
-                            )
-
-                to_delete = set(existing_ids) - set(sent_ids)
-                if to_delete:
-                    SubPost.objects.filter(id__in=to_delete, post=instance).delete()
+                reconcile_subposts(instance, validate_subposts(subposts_data))
+                # Сбрасываем подпосты, предзагруженные get_queryset()
+                instance._prefetched_objects_cache = {}
 
             return Response(self.get_serializer(instance).data)
 
@@ -332,6 +534,48 @@ class SubPostViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
+class ExportView(APIView):
+    """
+    Потоковая выгрузка posts, subposts, comments или likes для аналитики.
+    ?output=ndjson|csv, ?compress=gzip, фильтры ?author=, ?created_after=,
+    ?created_before=. Только для администраторов.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            ExportFilterSerializer,
+            OpenApiParameter("output", str, enum=EXPORT_FORMATS),
+            OpenApiParameter("compress", str, enum=["gzip"]),
+        ],
+        responses={200: OpenApiResponse(description="NDJSON или CSV, по строке на запись")},
+    )
+    def get(self, request, dataset):
+        if dataset not in DATASETS:
+            return Response(
+                {"error": f"Unknown dataset. Choose from: {', '.join(DATASETS)}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = request.query_params.get("compress") == "gzip"
+        filters = ExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+
+        rows = export_rows(dataset, **filters.validated_data)
+        response = StreamingHttpResponse(
+            render_export(dataset, rows, output, compress),
+            content_type=export_content_type(output, compress),
+        )
+        filename = export_filename(dataset, output, compress)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
 
 @require_POST
 def post_delete(request, pk):